@@ -0,0 +1,178 @@
+"""Новостной автопилот: свежие новости по темам канала -> посты в свободные слоты очереди.
+
+Конвейер из асинхронных генераторов, каждый этап держит в памяти только
+текущий элемент или одну пачку:
+
+    search -> dedupe -> batch -> generate -> enqueue
+
+Время каждого этапа копится в stats["stage_seconds"] и пишется в трейсинг.
+"""
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from database import (
+    get_news_topics, get_autopilot_channel_ids, is_link_covered, mark_links_covered,
+    get_last_scheduled_date, add_post_to_schedule
+)
+from tracing import span
+
+AUTOPILOT_INTERVAL_HOURS = int(os.getenv("AUTOPILOT_INTERVAL_HOURS", "6"))
+# Бюджет на канал за один прогон
+AUTOPILOT_MAX_POSTS = int(os.getenv("AUTOPILOT_MAX_POSTS", "3"))
+AUTOPILOT_MAX_LLM_CALLS = int(os.getenv("AUTOPILOT_MAX_LLM_CALLS", "2"))
+# Сколько символов новостей уходит в один запрос к LLM
+AUTOPILOT_BATCH_CHARS = int(os.getenv("AUTOPILOT_BATCH_CHARS", "3000"))
+SEARCH_CONCURRENCY = 4
+PUBLISH_HOUR = 12
+
+
+def next_publish_date(last_date, now):
+    """Следующий слот: 12:00 завтра или через день после последнего поста в очереди"""
+    target = (now + timedelta(days=1)).replace(hour=PUBLISH_HOUR, minute=0, second=0)
+    if last_date and last_date > now:
+        target = last_date + timedelta(days=1)
+        target = target.replace(hour=PUBLISH_HOUR, minute=0, second=0)
+    return target
+
+
+@contextmanager
+def _stage(stats, name):
+    started = time.perf_counter()
+    with span(f"autopilot.{name}"):
+        try:
+            yield
+        finally:
+            stats["stage_seconds"][name] = stats["stage_seconds"].get(name, 0.0) + time.perf_counter() - started
+
+
+async def default_search(query, region):
+    from news_engine import search_news
+    return await asyncio.to_thread(search_news, query, region)
+
+
+async def default_generate(user_text, channel_id):
+    from gpt_core import split_content_to_posts
+    return await split_content_to_posts(user_text, channel_id)
+
+
+async def search_topics(topics, search_fn, stats):
+    """Ищет все темы параллельно и отдаёт статьи по мере готовности поисков"""
+    semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+
+    async def one(topic):
+        async with semaphore:
+            return await search_fn(topic['query'], topic['region'])
+
+    tasks = [asyncio.create_task(one(t)) for t in topics]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            with _stage(stats, "search"):
+                try:
+                    articles = await next_done
+                except Exception as e:
+                    print(f"❌ Автопилот: ошибка поиска: {e}")
+                    continue
+            for article in articles or []:
+                stats["found"] += 1
+                yield article
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def dedupe(channel_id, articles, stats):
+    seen = set()
+    async for article in articles:
+        with _stage(stats, "dedupe"):
+            link = article['link']
+            fresh = link not in seen and not await is_link_covered(channel_id, link)
+            seen.add(link)
+        if fresh:
+            stats["fresh"] += 1
+            yield article
+
+
+async def batch(articles, max_chars):
+    current, size = [], 0
+    async for article in articles:
+        text_size = len(article['title']) + len(article['summary'])
+        if current and size + text_size > max_chars:
+            yield current
+            current, size = [], 0
+        current.append(article)
+        size += text_size
+    if current:
+        yield current
+
+
+def build_request(articles):
+    news = "\n\n".join(f"{a['title']}\n{a['summary']}" for a in articles)
+    return (
+        "Напиши посты по свежим новостям ниже. Каждая новость — отдельная тема, "
+        "перескажи её своими словами и добавь личное мнение автора.\n\n"
+        f"{news}"
+    )
+
+
+async def generate(channel_id, batches, generate_fn, max_calls, stats):
+    """Отдаёт (пост, ссылки пачки), пока не кончится бюджет вызовов LLM"""
+    async for articles in batches:
+        if stats["llm_calls"] >= max_calls:
+            break
+        stats["llm_calls"] += 1
+        with _stage(stats, "generate"):
+            posts = await generate_fn(build_request(articles), channel_id)
+        links = [a['link'] for a in articles]
+        for post in posts:
+            yield post, links
+
+
+async def enqueue(channel_id, posts, max_posts, stats):
+    now = datetime.now()
+    async for post, links in posts:
+        with _stage(stats, "enqueue"):
+            target = next_publish_date(await get_last_scheduled_date(channel_id), now)
+            await add_post_to_schedule(channel_id, post, target)
+            await mark_links_covered(channel_id, links)
+        stats["enqueued"] += 1
+        if stats["enqueued"] >= max_posts:
+            break
+
+
+async def run_channel(channel_id, search_fn=default_search, generate_fn=default_generate,
+                      max_posts=None, max_calls=None, batch_chars=None):
+    stats = {"channel_id": channel_id, "found": 0, "fresh": 0, "llm_calls": 0, "enqueued": 0, "stage_seconds": {}}
+    topics = await get_news_topics(channel_id)
+    if not topics:
+        return stats
+
+    with span("autopilot.run_channel", channel_id=channel_id):
+        found = search_topics(topics, search_fn, stats)
+        articles = dedupe(channel_id, found, stats)
+        batches = batch(articles, batch_chars or AUTOPILOT_BATCH_CHARS)
+        posts = generate(channel_id, batches, generate_fn, max_calls or AUTOPILOT_MAX_LLM_CALLS, stats)
+        try:
+            await enqueue(channel_id, posts, max_posts or AUTOPILOT_MAX_POSTS, stats)
+        finally:
+            # Бюджет мог кончиться раньше поиска: закрываем этапы снаружи внутрь
+            for stage in (posts, batches, articles, found):
+                await stage.aclose()
+    return stats
+
+
+async def autopilot_job(search_fn=default_search, generate_fn=default_generate):
+    results = []
+    for channel_id in await get_autopilot_channel_ids():
+        try:
+            stats = await run_channel(channel_id, search_fn, generate_fn)
+        except Exception as e:
+            print(f"❌ Автопилот, канал {channel_id}: {e}")
+            continue
+        timings = ", ".join(f"{k}={v:.2f}s" for k, v in stats["stage_seconds"].items())
+        print(f"📰 Автопилот, канал {channel_id}: найдено {stats['found']}, новых {stats['fresh']}, "
+              f"в очередь {stats['enqueued']} ({timings})")
+        results.append(stats)
+    return results
@@ -0,0 +1,139 @@
+"""Фейковые Bot API и OpenAI-совместимый сервер для бенчмарков и тестов.
+
+Оба сервера поднимаются в том же процессе на aiohttp и отвечают с
+настраиваемой задержкой, чтобы нагрузка упиралась в код бота, а не в сеть.
+"""
+import json
+import time
+import random
+import asyncio
+from aiohttp import web
+
+
+class FakeServer:
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = {}
+        self._runner = None
+        self.url = None
+
+    async def _sleep(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def make_app(self):
+        raise NotImplementedError
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        sock = site._server.sockets[0]
+        self.url = f"http://{host}:{sock.getsockname()[1]}"
+        return self
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class FakeBotAPI(FakeServer):
+    """Минимальный Bot API: отвечает на методы, которые зовут хендлеры бота"""
+
+    BOT_USER = {"id": 1, "is_bot": True, "first_name": "GhostwriterBot", "username": "ghostwriter_bot"}
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        super().__init__(latency, jitter)
+        self._message_id = 0
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    def _message(self, chat_id, text=None, caption=None):
+        self._message_id += 1
+        msg = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else -100, "type": "private"},
+            "from": self.BOT_USER,
+        }
+        if text is not None:
+            msg["text"] = text
+        if caption is not None:
+            msg["caption"] = caption
+        return msg
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        params = await request.post()
+        self._count(method)
+        await self._sleep()
+
+        if method in ("sendMessage", "editMessageText"):
+            result = self._message(params.get("chat_id", 0), text=params.get("text", ""))
+        elif method in ("sendPhoto", "sendVideo", "editMessageCaption"):
+            result = self._message(params.get("chat_id", 0), caption=params.get("caption", ""))
+        elif method == "getMe":
+            result = self.BOT_USER
+        elif method == "getChat":
+            result = {"id": -1001, "type": "channel", "title": "Fake channel"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+class FakeLLM(FakeServer):
+    """OpenAI-совместимый /v1/chat/completions с фиксированными ответами"""
+
+    def __init__(self, latency=0.0, jitter=0.0, posts_per_request=3, fail_rate=0.0):
+        super().__init__(latency, jitter)
+        self.posts_per_request = posts_per_request
+        self.fail_rate = fail_rate
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        return app
+
+    def provider(self, name="fake", models=None):
+        """Провайдер для llm_router, смотрящий на этот сервер"""
+        from llm_router import Provider
+        return Provider(name, f"{self.url}/v1", "fake", models or {"fast": f"{name}-fast", "large": f"{name}-large"})
+
+    def completion_text(self, body):
+        if body.get("response_format", {}).get("type") == "json_object":
+            posts = [
+                f"Пост {i + 1}. Я заметила, что лучшие идеи приходят на прогулке. " * 3
+                for i in range(self.posts_per_request)
+            ]
+            return json.dumps({"posts": posts}, ensure_ascii=False)
+        return "Переписанный пост: " + body["messages"][-1]["content"][:200]
+
+    async def handle(self, request):
+        body = await request.json()
+        self._count(body.get("model", "unknown"))
+        await self._sleep()
+        if self.fail_rate and random.random() < self.fail_rate:
+            return web.json_response({"error": {"message": "rate limited", "type": "rate_limit"}}, status=429)
+
+        content = self.completion_text(body)
+        return web.json_response({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": len(content) // 4, "total_tokens": 100 + len(content) // 4},
+        })
@@ -0,0 +1,461 @@
+"""Нагрузочный тест диспетчера из main.py на фейковых Bot API и LLM.
+
+Запуск:
+    python -m benchmarks.load_test --users 2000 --llm-latency 0.3
+    python -m benchmarks.load_test --save-baseline      # записать эталон
+    python -m benchmarks.load_test --check-baseline     # упасть при регрессии
+    python -m benchmarks.load_test --cluster 1,2,4 --save-baseline   # масштабирование cluster.py
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:FAKE-benchmark-token")
+os.environ.setdefault("GROQ_API_KEY", "fake")
+
+from benchmarks.fakes import FakeBotAPI, FakeLLM
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "load_test.json")
+CLUSTER_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "load_test_cluster.json")
+
+# Доли сценариев в смеси: примерно так выглядит живой трафик бота
+DEFAULT_MIX = {
+    "start": 0.25,
+    "generate": 0.30,
+    "rewrite": 0.15,
+    "queue_browse": 0.20,
+    "queue_add": 0.10,
+}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+
+def make_message_update(update_id, user_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _user(user_id),
+            "text": text,
+        },
+    }
+
+
+def make_callback_update(update_id, user_id, data, text="Текст поста из ленты"):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": FakeBotAPI.BOT_USER,
+                "text": text,
+            },
+        },
+    }
+
+
+async def seed_database(storage, users, queue_per_channel, due_posts, due_interval):
+    """Пользователи с доступом, по каналу на каждого и немного очереди.
+
+    Просроченные посты созревают по одному раз в due_interval секунд, чтобы
+    планировщик тикал много раз с небольшой работой, а не один раз со всей.
+    """
+    await storage.init_db()
+    now = datetime.now()
+    async with storage.connect() as db:
+        await db.executemany(
+            "INSERT INTO users (user_id, is_active, activated_at) VALUES (?, 1, ?)",
+            [(uid, now) for uid in users],
+        )
+        await db.executemany(
+            "INSERT INTO channels (id, user_id, channel_tg_id, title) VALUES (?, ?, ?, ?)",
+            [(uid, uid, f"@channel{uid}", f"Канал {uid}") for uid in users],
+        )
+        rows = []
+        for uid in users:
+            rows += [(uid, f"Запланированный пост {i}", now + timedelta(days=i + 1)) for i in range(queue_per_channel)]
+        rows += [
+            (users[i % len(users)], f"Просроченный пост {i}", now + timedelta(seconds=i * due_interval))
+            for i in range(due_posts)
+        ]
+        await db.executemany(
+            "INSERT INTO schedule (channel_id, post_text, publish_date, is_published) VALUES (?, ?, ?, 0)",
+            rows,
+        )
+        await db.commit()
+
+
+async def count_published(storage):
+    async with storage.connect() as db:
+        async with db.execute("SELECT COUNT(*) FROM schedule WHERE is_published = 1") as cursor:
+            return (await cursor.fetchone())[0]
+
+
+def build_workload(users, actions_per_user, mix, rng):
+    scenarios = list(mix)
+    weights = [mix[s] for s in scenarios]
+    workload = []
+    update_id = 0
+    for uid in users:
+        for _ in range(actions_per_user):
+            update_id += 1
+            scenario = rng.choices(scenarios, weights)[0]
+            if scenario == "start":
+                update = make_message_update(update_id, uid, "/start")
+            elif scenario == "generate":
+                update = make_message_update(update_id, uid, "Напиши 3 поста о выгорании у разработчиков")
+            elif scenario == "rewrite":
+                update = make_callback_update(update_id, uid, f"act_rewrite_{uid}")
+            elif scenario == "queue_browse":
+                update = make_callback_update(update_id, uid, f"queue_{uid}")
+            else:
+                update = make_callback_update(update_id, uid, f"act_queue_{uid}")
+            workload.append((scenario, update))
+    rng.shuffle(workload)
+    return workload
+
+
+async def run_load(users=1000, actions_per_user=3, concurrency=100, bot_latency=0.005,
+                   llm_latency=0.2, scheduler_interval=0.5, queue_per_channel=3,
+                   due_posts=60, mix=None, seed=1, db_path=None):
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.types import Update
+    from llm_router import LLMRouter
+    from outbox import Outbox
+    import database
+    import gpt_core
+    import main as bot_main
+
+    # main.py включает INFO-логи; на тысячах апдейтов они сами становятся нагрузкой
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(seed)
+    tmp_dir = None
+    if db_path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp_dir.name, "bench.db")
+
+    bot_api = await FakeBotAPI(latency=bot_latency).start()
+    llm = await FakeLLM(latency=llm_latency).start()
+
+    original = (bot_main.bot, bot_main.outbox, gpt_core.router)
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=AiohttpSession(api=TelegramAPIServer.from_base(bot_api.url)))
+    # Только свой временный файл: DATABASE_URL из окружения или .env увёл бы
+    # планировщик публиковать настоящие посты
+    storage = database.SQLiteStorage(db_path)
+    database.set_storage(storage)
+    bot_main.bot = bot
+    # Лимиты Telegram к фейковому API не относятся: меряем код бота, а не флуд-контроль
+    bot_main.outbox = Outbox(bot, global_rate=1e6, chat_rate=1e6, chat_burst=1000)
+    gpt_core.router = LLMRouter([llm.provider()])
+
+    user_ids = list(range(10_000, 10_000 + users))
+    rss_before = rss_mb()
+    try:
+        await seed_database(storage, user_ids, queue_per_channel, due_posts, scheduler_interval)
+        workload = build_workload(user_ids, actions_per_user, mix or DEFAULT_MIX, rng)
+
+        latencies = {}
+        errors = {}
+        tick_latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+        done = asyncio.Event()
+
+        async def feed(scenario, raw):
+            async with semaphore:
+                update = Update.model_validate(raw, context={"bot": bot})
+                started = time.perf_counter()
+                try:
+                    await bot_main.dp.feed_update(bot, update)
+                except Exception:
+                    errors[scenario] = errors.get(scenario, 0) + 1
+                latencies.setdefault(scenario, []).append(time.perf_counter() - started)
+
+        async def ticker():
+            while not done.is_set():
+                started = time.perf_counter()
+                await bot_main.scheduler_job()
+                tick_latencies.append(time.perf_counter() - started)
+                try:
+                    await asyncio.wait_for(done.wait(), scheduler_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        ticker_task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(feed(s, u) for s, u in workload))
+        # Хендлеры только ставят сообщения в очередь; throughput считаем до доставки
+        await bot_main.outbox.drain()
+        elapsed = time.perf_counter() - started
+        done.set()
+        await ticker_task
+        published = await count_published(storage)
+    finally:
+        await bot_main.outbox.close()
+        bot_main.bot, bot_main.outbox, gpt_core.router = original
+        database.set_storage(None)
+        await bot.session.close()
+        await bot_api.stop()
+        await llm.stop()
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "config": {
+            "users": users, "actions_per_user": actions_per_user, "concurrency": concurrency,
+            "bot_latency": bot_latency, "llm_latency": llm_latency, "seed": seed,
+        },
+        "updates": len(all_latencies),
+        "errors": sum(errors.values()),
+        "throughput_rps": round(len(all_latencies) / elapsed, 2),
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 2),
+        "scenarios": {
+            name: {
+                "count": len(values),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+            for name, values in sorted(latencies.items())
+        },
+        # Тики планировщика — отдельный фон, в compare_to_baseline не участвуют
+        "scheduler": {
+            "ticks": len(tick_latencies),
+            "published": published,
+            "tick_p50_ms": round(percentile(tick_latencies, 50) * 1000, 2),
+            "tick_p99_ms": round(percentile(tick_latencies, 99) * 1000, 2),
+        },
+        "bot_api_calls": bot_api.calls,
+        "peak_rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+    }
+
+
+def cluster_worker(index, queue, events, api_url, llm_provider, db_path):
+    """Воркер cluster.py, у которого бот, LLM и база подменены на фейки бенчмарка"""
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_cluster_worker(index, queue, events, api_url, llm_provider, db_path))
+
+
+async def _cluster_worker(index, queue, events, api_url, llm_provider, db_path):
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from llm_router import LLMRouter
+    from outbox import Outbox
+    import cluster
+    import database
+    import gpt_core
+    import main as bot_main
+
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+    bot_main.bot = bot
+    bot_main.outbox = Outbox(bot, global_rate=1e6, chat_rate=1e6, chat_burst=1000)
+    gpt_core.router = LLMRouter([llm_provider])
+    # Ленивый импорт openai — это холодный старт, а не пропускная способность
+    llm_provider.client
+    database.set_storage(database.SQLiteStorage(db_path))
+
+    handled = errors = 0
+    feed_update = bot_main.dp.feed_update
+
+    async def counted(bot, update):
+        nonlocal handled, errors
+        try:
+            return await feed_update(bot, update)
+        except Exception:
+            errors += 1
+            raise
+        finally:
+            handled += 1
+
+    bot_main.dp.feed_update = counted
+    events.put(("ready", index))
+    await cluster._worker(index, queue)
+    events.put(("done", index, handled, errors))
+
+
+async def run_cluster_load(workers, users=1000, actions_per_user=3, bot_latency=0.005,
+                           llm_latency=0.2, queue_per_channel=3, mix=None, seed=1):
+    """То же смешанное окно апдейтов, но через шардирование cluster.py на N процессов.
+
+    Время считается от первого апдейта до момента, когда все воркеры всё
+    обработали и отправили: импорт main в воркерах в него не входит.
+    """
+    import multiprocessing as mp
+    import cluster
+    import database
+
+    rng = random.Random(seed)
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp_dir.name, "bench.db")
+    user_ids = list(range(10_000, 10_000 + users))
+    # Просроченных постов нет: публикатор в кластере один, меряем обработку апдейтов
+    await seed_database(database.SQLiteStorage(db_path), user_ids, queue_per_channel, 0, 0)
+    workload = build_workload(user_ids, actions_per_user, mix or DEFAULT_MIX, rng)
+
+    bot_api = await FakeBotAPI(latency=bot_latency).start()
+    llm = await FakeLLM(latency=llm_latency).start()
+    ctx = mp.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(workers)]
+    events = ctx.Queue()
+    processes = [
+        ctx.Process(target=cluster_worker, args=(i, q, events, bot_api.url, llm.provider(), db_path), daemon=True)
+        for i, q in enumerate(queues)
+    ]
+    loop = asyncio.get_running_loop()
+    try:
+        for p in processes:
+            p.start()
+        for _ in processes:
+            await loop.run_in_executor(None, events.get)
+
+        started = time.perf_counter()
+        for _, raw in workload:
+            queues[cluster.shard_for(raw, workers)].put(json.dumps(raw))
+        for q in queues:
+            q.put(None)
+        reports = [await loop.run_in_executor(None, events.get) for _ in processes]
+        elapsed = time.perf_counter() - started
+    finally:
+        for p in processes:
+            await loop.run_in_executor(None, p.join, 30)
+            if p.is_alive():
+                p.kill()
+        await bot_api.stop()
+        await llm.stop()
+        tmp_dir.cleanup()
+
+    handled = sum(r[2] for r in reports)
+    return {
+        "workers": workers,
+        "updates": handled,
+        "errors": sum(r[3] for r in reports),
+        "throughput_rps": round(handled / elapsed, 2),
+        "bot_api_calls": bot_api.calls,
+    }
+
+
+async def run_cluster_scaling(worker_counts, **kwargs):
+    """Throughput для каждого числа воркеров и его доля от линейного роста"""
+    runs = [await run_cluster_load(n, **kwargs) for n in worker_counts]
+    single = runs[0]["throughput_rps"] / runs[0]["workers"]
+    return {
+        "config": dict(kwargs, cpu_count=os.cpu_count()),
+        "runs": {
+            str(r["workers"]): dict(r, linear_efficiency=round(r["throughput_rps"] / (single * r["workers"]), 2))
+            for r in runs
+        },
+    }
+
+
+def compare_to_baseline(result, baseline, tolerance):
+    """Список регрессий относительно эталона (пустой — всё ок)"""
+    problems = []
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        problems.append(f"throughput {result['throughput_rps']} < {baseline['throughput_rps']} rps")
+    for key in ("p50_ms", "p99_ms", "peak_rss_mb"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            problems.append(f"{key} {result[key]} > {baseline[key]}")
+    if result["errors"] > baseline["errors"]:
+        problems.append(f"errors {result['errors']} > {baseline['errors']}")
+    return problems
+
+
+def compare_cluster_to_baseline(result, baseline, tolerance):
+    """Регрессии throughput по каждому числу воркеров из эталона"""
+    problems = []
+    for workers, base in baseline["runs"].items():
+        run = result["runs"].get(workers)
+        if run is None:
+            continue
+        if run["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{workers} воркер(а): throughput {run['throughput_rps']} < {base['throughput_rps']} rps")
+        if run["errors"] > base["errors"]:
+            problems.append(f"{workers} воркер(а): errors {run['errors']} > {base['errors']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест AI Ghostwriter Bot")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--actions", type=int, default=3, help="апдейтов на пользователя")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--bot-latency", type=float, default=0.005)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--cluster", help="числа воркеров через запятую (1,2,4): прогон через cluster.py")
+    args = parser.parse_args()
+
+    if args.cluster:
+        # --concurrency тут ни при чём: воркер cluster.py берёт всё, что ему пришло
+        result = asyncio.run(run_cluster_scaling(
+            [int(n) for n in args.cluster.split(",")], users=args.users, actions_per_user=args.actions,
+            bot_latency=args.bot_latency, llm_latency=args.llm_latency, seed=args.seed,
+        ))
+        baseline_path, compare = CLUSTER_BASELINE_PATH, compare_cluster_to_baseline
+    else:
+        result = asyncio.run(run_load(
+            users=args.users, actions_per_user=args.actions, concurrency=args.concurrency,
+            bot_latency=args.bot_latency, llm_latency=args.llm_latency, seed=args.seed,
+        ))
+        baseline_path, compare = BASELINE_PATH, compare_to_baseline
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"💾 Эталон сохранён: {baseline_path}")
+
+    if args.check_baseline:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["config"] != result["config"]:
+            print("⚠️ Конфигурация отличается от эталона, сравнение может быть нечестным")
+        problems = compare(result, baseline, args.tolerance)
+        if problems:
+            print("❌ Регрессия:\n" + "\n".join(problems))
+            sys.exit(1)
+        print("✅ В пределах эталона")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Пропускная способность llm_json.parse_posts на типичных ответах модели.
+
+    python -m benchmarks.parser_bench --responses 2000
+"""
+import os
+import json
+import time
+import random
+import argparse
+
+from llm_json import parse_posts
+
+RESULT_PATH = os.path.join(os.path.dirname(__file__), "baselines", "parser.json")
+
+
+def make_response(rng, posts_per_response):
+    words = "я заметила идея команда продукт запуск ошибка вывод утро история опыт".split()
+    posts = [" ".join(rng.choices(words, k=100)) + "." for _ in range(posts_per_response)]
+    return json.dumps({"posts": posts}, ensure_ascii=False)
+
+
+def variants(valid, rng):
+    """Корректный ответ и его типичные поломки"""
+    return {
+        "valid": valid,
+        "fenced_trailing_comma": "```json\n" + valid.replace('"]}', '",]}') + "\n```",
+        "raw_newlines": valid.replace(". ", ".\n", 3),
+        "truncated": valid[:rng.randint(len(valid) // 2, len(valid) - 5)],
+    }
+
+
+def bench(texts, func, rounds):
+    size = sum(len(t.encode()) for t in texts)
+    started = time.perf_counter()
+    posts = 0
+    for _ in range(rounds):
+        for text in texts:
+            result = func(text)
+            posts += len(result[0]) if isinstance(result, tuple) else len(result["posts"])
+    elapsed = time.perf_counter() - started
+    return {
+        "mb_per_s": round(size * rounds / elapsed / 1024 / 1024, 1),
+        "responses_per_s": round(len(texts) * rounds / elapsed),
+        "posts_per_s": round(posts / elapsed),
+    }
+
+
+def run(responses, posts_per_response, rounds, seed=1):
+    rng = random.Random(seed)
+    valid = [make_response(rng, posts_per_response) for _ in range(responses)]
+    by_kind = {}
+    for text in valid:
+        for kind, variant in variants(text, rng).items():
+            by_kind.setdefault(kind, []).append(variant)
+
+    result = {"config": {"responses": responses, "posts_per_response": posts_per_response, "rounds": rounds}}
+    result["json.loads (valid)"] = bench(valid, json.loads, rounds)
+    for kind, texts in by_kind.items():
+        result[f"parse_posts ({kind})"] = bench(texts, parse_posts, rounds)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора JSON-ответов LLM")
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--save", action="store_true", help=f"записать результат в {RESULT_PATH}")
+    args = parser.parse_args()
+
+    result = run(args.responses, args.posts, args.rounds)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.save:
+        with open(RESULT_PATH, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Латентность запросов к schedule до и после архивации на синтетике за несколько лет.
+
+    python -m benchmarks.retention_bench --channels 100 --years 3
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+import database
+
+RESULT_PATH = os.path.join(os.path.dirname(__file__), "baselines", "retention.json")
+
+
+def fill(path, channels, years, pending_per_channel, seed=1):
+    """Один опубликованный пост в день на канал за years лет плюс хвост очереди"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    days = int(years * 365)
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO channels (id, user_id, channel_tg_id, title) VALUES (?, ?, ?, ?)",
+        [(ch, ch, f"@channel{ch}", f"Канал {ch}") for ch in range(1, channels + 1)],
+    )
+    words = "контент канал идея история опыт утро команда продукт запуск ошибка вывод".split()
+    for day in range(days, 0, -1):
+        date = (now - timedelta(days=day)).replace(hour=12, minute=0, second=0, microsecond=0)
+        db.executemany(
+            "INSERT INTO schedule (channel_id, post_text, publish_date, is_published) VALUES (?, ?, ?, 1)",
+            [(ch, " ".join(rng.choices(words, k=90)), date) for ch in range(1, channels + 1)],
+        )
+    for i in range(pending_per_channel):
+        date = (now + timedelta(days=i + 1)).replace(hour=12, minute=0, second=0, microsecond=0)
+        db.executemany(
+            "INSERT INTO schedule (channel_id, post_text, publish_date, is_published) VALUES (?, ?, ?, 0)",
+            [(ch, f"Запланированный пост {i}", date) for ch in range(1, channels + 1)],
+        )
+    db.commit()
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+
+
+async def measure(channels, repeats):
+    rng = random.Random(2)
+    queries = {
+        "get_all_pending_posts": lambda ch: database.get_all_pending_posts(ch),
+        "get_last_scheduled_date": lambda ch: database.get_last_scheduled_date(ch),
+        "get_recent_generated_posts": lambda ch: database.get_recent_generated_posts(ch, limit=3),
+        "get_channel_stats": lambda ch: database.get_channel_stats(ch),
+        "get_due_posts": lambda ch: database.get_due_posts(datetime.now()),
+    }
+    result = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeats):
+            ch = rng.randint(1, channels)
+            started = time.perf_counter()
+            await query(ch)
+            timings.append(time.perf_counter() - started)
+        result[name] = round(statistics.median(timings) * 1000, 3)
+    return result
+
+
+def file_size_mb(path):
+    total = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+    return round(total / 1024 / 1024, 1)
+
+
+async def run(channels, years, retention_days, repeats):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retention.db")
+        database.set_storage(database.SQLiteStorage(path))
+        try:
+            await database.init_db()
+            fill(path, channels, years, pending_per_channel=10)
+
+            before = await measure(channels, repeats)
+            size_before = file_size_mb(path)
+
+            started = time.perf_counter()
+            moved = await database.archive_published_posts(days=retention_days)
+            archive_seconds = time.perf_counter() - started
+            db = sqlite3.connect(path)
+            hot_rows = db.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            db.close()
+
+            after = await measure(channels, repeats)
+            size_after = file_size_mb(path)
+        finally:
+            database.set_storage(None)
+
+    return {
+        "config": {"channels": channels, "years": years, "retention_days": retention_days},
+        "archived_rows": moved,
+        "hot_rows_after": hot_rows,
+        "archive_seconds": round(archive_seconds, 2),
+        "db_size_mb": {"before": size_before, "after": size_after},
+        "median_ms": {name: {"before": before[name], "after": after[name]} for name in before},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк архивации опубликованных постов")
+    parser.add_argument("--channels", type=int, default=100)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--retention-days", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--save", action="store_true", help=f"записать результат в {RESULT_PATH}")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.channels, args.years, args.retention_days, args.repeats))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.save:
+        with open(RESULT_PATH, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
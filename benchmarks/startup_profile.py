@@ -0,0 +1,156 @@
+"""Холодный старт бота: время импорта, время до первого getUpdates и RSS.
+
+Каждый замер — отдельный свежий процесс. main() крутится против фейкового
+Bot API; как только бот впервые зовёт getUpdates, процесс фиксирует время,
+RSS и какие тяжёлые подсистемы уже загружены, и останавливает поллинг.
+
+    python -m benchmarks.startup_profile --runs 5
+    python -m benchmarks.startup_profile --save
+
+Для сравнения «до/после» профиль снимается и с другой копии дерева:
+
+    git worktree add /tmp/before <commit>
+    python -m benchmarks.startup_profile --root /tmp/before --save-as startup_before.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import tempfile
+
+from benchmarks.fakes import FakeBotAPI
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+RESULT_PATH = os.path.join(BASELINES_DIR, "startup.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Подсистемы, которые не нужны, чтобы ответить на /start
+HEAVY_MODULES = ("openai", "duckduckgo_search", "apscheduler", "asyncpg", "opentelemetry")
+
+CHILD = r"""
+import os, sys, json, time, asyncio, resource
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from aiogram.client.telegram import TelegramAPIServer
+
+main.bot.session.api = TelegramAPIServer.from_base(os.environ["FAKE_BOT_API"])
+report = {}
+
+async def stop_at_polling(make_request, bot, method):
+    if type(method).__name__ == "GetUpdates" and not report:
+        report.update(
+            import_s=imported - started,
+            polling_s=time.perf_counter() - started,
+            polling_at=time.time(),
+            rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            loaded=[m for m in json.loads(os.environ["HEAVY_MODULES"]) if m in sys.modules],
+        )
+        asyncio.get_running_loop().create_task(main.dp.stop_polling())
+        return []
+    return await make_request(bot, method)
+
+main.bot.session.middleware(stop_at_polling)
+asyncio.run(main.main())
+print("STARTUP " + json.dumps(report))
+"""
+
+
+def child_env(root=ROOT, **extra):
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "123456:FAKE-benchmark-token")
+    env.setdefault("GROQ_API_KEY", "fake")
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    env.update(extra)
+    return env
+
+
+async def measure_once(api_url, root=ROOT):
+    """Один холодный старт в отдельном процессе (cwd — временный каталог под SQLite-файл)"""
+    with tempfile.TemporaryDirectory() as cwd:
+        spawned = time.time()
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", CHILD, cwd=cwd,
+            env=child_env(root, FAKE_BOT_API=api_url, HEAVY_MODULES=json.dumps(HEAVY_MODULES)),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        out, _ = await proc.communicate()
+    line = next(l for l in out.decode().splitlines() if l.startswith("STARTUP "))
+    report = json.loads(line[len("STARTUP "):])
+    # Сюда входит и запуск интерпретатора
+    report["process_to_polling_s"] = report.pop("polling_at") - spawned
+    return report
+
+
+def tree_commit(root):
+    """Какой коммит профилируем: профили «до» и «после» иначе не отличить"""
+    import subprocess
+    result = subprocess.run(["git", "-C", root, "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def import_breakdown(top, root=ROOT):
+    """Кумулятивное время импорта по пакетам верхнего уровня из python -X importtime"""
+    import subprocess
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=root, env=child_env(root), capture_output=True, text=True,
+    )
+    by_package = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        # Самый внешний импорт пакета уже включает все его подмодули
+        by_package[package] = max(by_package.get(package, 0), int(cumulative))
+    by_package.pop("main", None)
+    ranked = sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {name: round(us / 1000, 1) for name, us in ranked}
+
+
+async def run(runs, top=15, root=ROOT):
+    bot_api = await FakeBotAPI().start()
+    try:
+        reports = [await measure_once(bot_api.url, root) for _ in range(runs)]
+    finally:
+        await bot_api.stop()
+
+    def median(key):
+        return round(statistics.median(r[key] for r in reports), 3)
+
+    return {
+        "config": {"runs": runs, "python": sys.version.split()[0], "commit": tree_commit(root)},
+        "import_main_s": median("import_s"),
+        "to_polling_s": median("polling_s"),
+        "process_to_polling_s": median("process_to_polling_s"),
+        "rss_at_polling_mb": round(statistics.median(r["rss_mb"] for r in reports), 1),
+        "heavy_loaded_at_polling": reports[0]["loaded"],
+        "import_ms_by_package": import_breakdown(top, root),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Профиль холодного старта бота")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="сколько пакетов показать в разбивке импорта")
+    parser.add_argument("--root", default=ROOT, help="профилировать другую копию дерева (git worktree)")
+    parser.add_argument("--save", action="store_true", help=f"записать результат в {RESULT_PATH}")
+    parser.add_argument("--save-as", help="записать результат в benchmarks/baselines/<имя>")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.runs, args.top, os.path.abspath(args.root)))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.save or args.save_as:
+        path = os.path.join(BASELINES_DIR, args.save_as) if args.save_as else RESULT_PATH
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
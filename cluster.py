@@ -0,0 +1,113 @@
+"""Многопроцессный запуск: один процесс читает апдейты, N воркеров их обрабатывают.
+
+Апдейты шардируются по user_id, поэтому все сообщения пользователя попадают
+в один и тот же воркер и его FSM-состояние в MemoryStorage остаётся целым.
+Планировщик запущен в каждом воркере, но публикует только держатель аренды
+"publisher" в таблице leases (см. main.scheduler_job). SQLite-файл общий,
+в режиме WAL.
+
+    WORKERS=4 python cluster.py
+"""
+import os
+import json
+import asyncio
+import logging
+import multiprocessing as mp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WORKERS = int(os.getenv("WORKERS") or os.cpu_count() or 1)
+POLL_TIMEOUT = 30
+
+
+def shard_for(update, workers):
+    """Номер воркера для апдейта (dict в формате Bot API)"""
+    for key, value in update.items():
+        if isinstance(value, dict):
+            user = value.get("from") or value.get("user")
+            if user and "id" in user:
+                return user["id"] % workers
+            chat = value.get("chat")
+            if chat and "id" in chat:
+                return chat["id"] % workers
+    return update.get("update_id", 0) % workers
+
+
+def worker_main(index, queue):
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_worker(index, queue))
+
+
+async def _worker(index, queue):
+    from aiogram.types import Update
+    import main
+
+    main.start_scheduler()
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    print(f"⚙️ Воркер {index} запущен ({main.WORKER_ID})")
+
+    while True:
+        raw = await loop.run_in_executor(None, queue.get)
+        if raw is None:
+            break
+        update = Update.model_validate_json(raw, context={"bot": main.bot})
+        task = asyncio.create_task(main.dp.feed_update(main.bot, update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await main.outbox.drain()
+    main.scheduler.shutdown(wait=False)
+    await main.bot.session.close()
+
+
+async def _route(queues):
+    import main
+
+    await main.init_db()
+    await main.set_commands()
+    await main.bot.delete_webhook(drop_pending_updates=True)
+    allowed = main.dp.resolve_used_update_types()
+    print(f"🤖 Бот запущен в кластере: {len(queues)} воркеров")
+
+    offset = None
+    try:
+        while True:
+            try:
+                updates = await main.bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, allowed_updates=allowed)
+            except Exception as e:
+                logging.error(f"❌ Ошибка getUpdates: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                data = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+                queues[shard_for(data, len(queues))].put(json.dumps(data))
+                offset = update.update_id + 1
+    finally:
+        await main.bot.session.close()
+
+
+def run_cluster(workers=WORKERS):
+    ctx = mp.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(workers)]
+    processes = [ctx.Process(target=worker_main, args=(i, q), daemon=True) for i, q in enumerate(queues)]
+    for p in processes:
+        p.start()
+
+    try:
+        asyncio.run(_route(queues))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for q in queues:
+            q.put(None)
+        for p in processes:
+            p.join(timeout=10)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_cluster()
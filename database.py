@@ -1,206 +1,617 @@
+import os
+import time
 import aiosqlite
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from tracing import traced
 
 DB_NAME = "bot_data.db"
+# postgresql://... — хранилище на PostgreSQL (database_pg.py), иначе SQLite-файл DB_NAME
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+# Сколько ждать чужую блокировку записи: в кластере файл делят несколько процессов
+SQLITE_TIMEOUT = float(os.getenv("SQLITE_TIMEOUT", "30"))
+# На сколько секунд публикатор забирает пост себе (см. claim_due_posts)
+CLAIM_SECONDS = 300
+# Опубликованные посты старше стольких дней уезжают в schedule_archive (0 — все опубликованные)
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = 500
 
-async def init_db():
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS channels (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                channel_tg_id TEXT,
-                title TEXT
+
+class SQLiteStorage:
+    """Хранилище по умолчанию: один файл, каждое обращение — своё соединение.
+
+    Тот же набор методов реализует PostgresStorage в database_pg.py.
+    Строки возвращаются объектами с доступом по имени колонки.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._vacuum_warned = False
+
+    def connect(self):
+        return aiosqlite.connect(self.path, timeout=SQLITE_TIMEOUT)
+
+    async def init_db(self):
+        async with self.connect() as db:
+            # Для новой базы; существующую переводит compact() (см. ниже)
+            await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL: читатели не блокируют писателя, режим сохраняется в самом файле
+            await db.execute("PRAGMA journal_mode=WAL")
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS channels (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    channel_tg_id TEXT,
+                    title TEXT
+                )
+            """)
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS style_examples (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel_id INTEGER,
+                    text TEXT
+                )
+            """)
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS schedule (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel_id INTEGER,
+                    post_text TEXT,
+                    media_file_id TEXT,
+                    media_type TEXT,
+                    publish_date DATETIME,
+                    is_published BOOLEAN DEFAULT 0,
+                    claimed_until REAL
+                )
+            """)
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id INTEGER PRIMARY KEY,
+                    is_active BOOLEAN DEFAULT 0,
+                    activated_at DATETIME
+                )
+            """)
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS promocodes (
+                    code TEXT PRIMARY KEY,
+                    created_by INTEGER,
+                    is_used BOOLEAN DEFAULT 0,
+                    used_by INTEGER
+                )
+            """)
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT,
+                    expires_at REAL
+                )
+            """)
+
+            # Опубликованные посты после RETENTION_DAYS: id сохраняются, чтобы
+            # история для анти-повторов оставалась в прежнем порядке
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS schedule_archive (
+                    id INTEGER PRIMARY KEY,
+                    channel_id INTEGER,
+                    post_text TEXT,
+                    media_file_id TEXT,
+                    media_type TEXT,
+                    publish_date DATETIME,
+                    archived_at DATETIME
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS schedule_archive_channel_idx ON schedule_archive (channel_id, id)")
+
+            # Темы новостного автопилота и ссылки, по которым уже есть посты
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS news_topics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel_id INTEGER,
+                    query TEXT,
+                    region TEXT
+                )
+            """)
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS covered_links (
+                    channel_id INTEGER,
+                    url TEXT,
+                    covered_at DATETIME,
+                    PRIMARY KEY (channel_id, url)
+                )
+            """)
+
+            # Базы, созданные до появления claimed_until
+            async with db.execute("PRAGMA table_info(schedule)") as cursor:
+                columns = [row[1] for row in await cursor.fetchall()]
+            if "claimed_until" not in columns:
+                await db.execute("ALTER TABLE schedule ADD COLUMN claimed_until REAL")
+            await db.commit()
+
+    async def insert_promocode(self, code, admin_id):
+        async with self.connect() as db:
+            await db.execute("INSERT INTO promocodes (code, created_by) VALUES (?, ?)", (code, admin_id))
+            await db.commit()
+
+    async def check_user_access(self, user_id):
+        async with self.connect() as db:
+            async with db.execute("SELECT is_active FROM users WHERE user_id = ?", (user_id,)) as cursor:
+                row = await cursor.fetchone()
+                return bool(row and row[0])
+
+    async def redeem_promocode(self, user_id, code):
+        """'ok', 'missing' или 'used'"""
+        async with self.connect() as db:
+            async with db.execute("SELECT is_used FROM promocodes WHERE code = ?", (code,)) as cursor:
+                row = await cursor.fetchone()
+                if not row:
+                    return "missing"
+                if row[0]:
+                    return "used"
+
+            await db.execute("UPDATE promocodes SET is_used = 1, used_by = ? WHERE code = ?", (user_id, code))
+
+            await db.execute("""
+                INSERT INTO users (user_id, is_active, activated_at)
+                VALUES (?, 1, ?)
+                ON CONFLICT(user_id) DO UPDATE SET is_active=1
+            """, (user_id, datetime.now()))
+
+            await db.commit()
+            return "ok"
+
+    async def add_channel(self, user_id, channel_tg_id, title):
+        async with self.connect() as db:
+            await db.execute(
+                "INSERT INTO channels (user_id, channel_tg_id, title) VALUES (?, ?, ?)",
+                (user_id, channel_tg_id, title)
             )
-        """)
+            await db.commit()
+
+    async def get_user_channels(self, user_id):
+        async with self.connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM channels WHERE user_id = ?", (user_id,)) as cursor:
+                return await cursor.fetchall()
+
+    async def get_channel_by_id(self, channel_db_id):
+        async with self.connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM channels WHERE id = ?", (channel_db_id,)) as cursor:
+                return await cursor.fetchone()
+
+    async def add_style_example(self, channel_id, text):
+        async with self.connect() as db:
+            await db.execute("INSERT INTO style_examples (channel_id, text) VALUES (?, ?)", (channel_id, text))
+            await db.commit()
+
+    async def clear_style_examples(self, channel_id):
+        async with self.connect() as db:
+            await db.execute("DELETE FROM style_examples WHERE channel_id = ?", (channel_id,))
+            await db.commit()
 
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS style_examples (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                channel_id INTEGER,
-                text TEXT
+    async def get_style_examples(self, channel_id, limit):
+        async with self.connect() as db:
+            async with db.execute("SELECT text FROM style_examples WHERE channel_id = ? ORDER BY RANDOM() LIMIT ?", (channel_id, limit)) as cursor:
+                return [r[0] for r in await cursor.fetchall()]
+
+    async def add_post_to_schedule(self, channel_id, text, pub_date, media_id=None, media_type=None):
+        async with self.connect() as db:
+            await db.execute(
+                "INSERT INTO schedule (channel_id, post_text, publish_date, media_file_id, media_type, is_published) VALUES (?, ?, ?, ?, ?, 0)",
+                (channel_id, text, pub_date, media_id, media_type)
             )
-        """)
-
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS schedule (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                channel_id INTEGER,
-                post_text TEXT,
-                media_file_id TEXT,
-                media_type TEXT,
-                publish_date DATETIME,
-                is_published BOOLEAN DEFAULT 0
+            await db.commit()
+
+    async def get_due_posts(self, current_time):
+        async with self.connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(
+                """
+                SELECT s.*, c.channel_tg_id
+                FROM schedule s
+                JOIN channels c ON s.channel_id = c.id
+                WHERE s.is_published = 0 AND s.publish_date <= ?
+                """,
+                (current_time,)
+            ) as cursor:
+                return await cursor.fetchall()
+
+    async def claim_due_posts(self, current_time, limit, claim_seconds):
+        now = time.time()
+        async with self.connect() as db:
+            db.row_factory = aiosqlite.Row
+            # IMMEDIATE берёт блокировку записи сразу: два процесса не заберут одни и те же строки
+            await db.execute("BEGIN IMMEDIATE")
+            async with db.execute(
+                """
+                SELECT s.*, c.channel_tg_id
+                FROM schedule s
+                JOIN channels c ON s.channel_id = c.id
+                WHERE s.is_published = 0 AND s.publish_date <= ?
+                  AND (s.claimed_until IS NULL OR s.claimed_until < ?)
+                ORDER BY s.publish_date
+                LIMIT ?
+                """,
+                (current_time, now, limit)
+            ) as cursor:
+                rows = await cursor.fetchall()
+            await db.executemany(
+                "UPDATE schedule SET claimed_until = ? WHERE id = ?",
+                [(now + claim_seconds, row['id']) for row in rows]
             )
-        """)
+            await db.commit()
+            return rows
+
+    async def mark_as_published(self, post_id):
+        async with self.connect() as db:
+            await db.execute("UPDATE schedule SET is_published = 1 WHERE id = ?", (post_id,))
+            await db.commit()
+
+    async def get_last_scheduled_date(self, channel_id):
+        async with self.connect() as db:
+            async with db.execute("SELECT MAX(publish_date) FROM schedule WHERE is_published = 0 AND channel_id = ?", (channel_id,)) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+
+    async def get_all_pending_posts(self, channel_id):
+        async with self.connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM schedule WHERE is_published = 0 AND channel_id = ? ORDER BY publish_date ASC", (channel_id,)) as cursor:
+                return await cursor.fetchall()
+
+    async def delete_post(self, post_id):
+        async with self.connect() as db:
+            await db.execute("DELETE FROM schedule WHERE id = ?", (post_id,))
+            await db.commit()
+
+    async def get_recent_post_texts(self, channel_id, limit):
+        async with self.connect() as db:
+            async with db.execute(
+                """
+                SELECT post_text FROM (
+                    SELECT id, post_text FROM schedule WHERE channel_id = ?
+                    UNION ALL
+                    SELECT id, post_text FROM schedule_archive WHERE channel_id = ?
+                ) ORDER BY id DESC LIMIT ?
+                """,
+                (channel_id, channel_id, limit)
+            ) as cursor:
+                return [r[0] for r in await cursor.fetchall()]
 
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                is_active BOOLEAN DEFAULT 0,
-                activated_at DATETIME
+    async def get_scheduled_post(self, post_id):
+        async with self.connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM schedule WHERE id = ?", (post_id,)) as cursor:
+                return await cursor.fetchone()
+
+    async def update_scheduled_post_text(self, post_id, new_text):
+        async with self.connect() as db:
+            await db.execute("UPDATE schedule SET post_text = ? WHERE id = ?", (new_text, post_id))
+            await db.commit()
+
+    async def update_scheduled_post_media(self, post_id, media_id, media_type):
+        async with self.connect() as db:
+            await db.execute(
+                "UPDATE schedule SET media_file_id = ?, media_type = ? WHERE id = ?",
+                (media_id, media_type, post_id)
             )
-        """)
-
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS promocodes (
-                code TEXT PRIMARY KEY,
-                created_by INTEGER,
-                is_used BOOLEAN DEFAULT 0,
-                used_by INTEGER
+            await db.commit()
+
+    async def get_channel_stats(self, channel_id):
+        async with self.connect() as db:
+            async with db.execute(
+                """
+                SELECT
+                    (SELECT COUNT(*) FROM schedule WHERE channel_id = ? AND is_published = 1)
+                        + (SELECT COUNT(*) FROM schedule_archive WHERE channel_id = ?),
+                    (SELECT COUNT(*) FROM schedule WHERE channel_id = ? AND is_published = 0),
+                    (SELECT COUNT(*) FROM schedule_archive WHERE channel_id = ?)
+                """,
+                (channel_id, channel_id, channel_id, channel_id)
+            ) as cursor:
+                published, pending, archived = await cursor.fetchone()
+                return {"published": published, "pending": pending, "archived": archived}
+
+    async def add_news_topic(self, channel_id, query, region):
+        async with self.connect() as db:
+            await db.execute("INSERT INTO news_topics (channel_id, query, region) VALUES (?, ?, ?)", (channel_id, query, region))
+            await db.commit()
+
+    async def clear_news_topics(self, channel_id):
+        async with self.connect() as db:
+            await db.execute("DELETE FROM news_topics WHERE channel_id = ?", (channel_id,))
+            await db.commit()
+
+    async def get_news_topics(self, channel_id):
+        async with self.connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM news_topics WHERE channel_id = ? ORDER BY id", (channel_id,)) as cursor:
+                return await cursor.fetchall()
+
+    async def get_autopilot_channel_ids(self):
+        async with self.connect() as db:
+            async with db.execute("SELECT DISTINCT channel_id FROM news_topics ORDER BY channel_id") as cursor:
+                return [r[0] for r in await cursor.fetchall()]
+
+    async def is_link_covered(self, channel_id, url):
+        async with self.connect() as db:
+            async with db.execute("SELECT 1 FROM covered_links WHERE channel_id = ? AND url = ?", (channel_id, url)) as cursor:
+                return await cursor.fetchone() is not None
+
+    async def mark_links_covered(self, channel_id, urls):
+        async with self.connect() as db:
+            now = datetime.now()
+            await db.executemany(
+                "INSERT OR IGNORE INTO covered_links (channel_id, url, covered_at) VALUES (?, ?, ?)",
+                [(channel_id, url, now) for url in urls]
             )
-        """)
-        await db.commit()
+            await db.commit()
+
+    async def archive_published_posts(self, cutoff, batch_size):
+        """Переносит одну пачку; возвращает, сколько строк перенесено"""
+        async with self.connect() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            async with db.execute(
+                "SELECT id FROM schedule WHERE is_published = 1 AND publish_date < ? ORDER BY id LIMIT ?",
+                (cutoff, batch_size)
+            ) as cursor:
+                ids = [r[0] for r in await cursor.fetchall()]
+            if not ids:
+                await db.rollback()
+                return 0
+
+            placeholders = ",".join("?" * len(ids))
+            await db.execute(
+                f"""
+                INSERT OR REPLACE INTO schedule_archive (id, channel_id, post_text, media_file_id, media_type, publish_date, archived_at)
+                SELECT id, channel_id, post_text, media_file_id, media_type, publish_date, ?
+                FROM schedule WHERE id IN ({placeholders})
+                """,
+                (datetime.now(), *ids)
+            )
+            await db.execute(f"DELETE FROM schedule WHERE id IN ({placeholders})", ids)
+            await db.commit()
+            return len(ids)
+
+    async def compact(self, max_pages=None):
+        """Возвращает освободившиеся страницы файлу (только в режиме auto_vacuum=INCREMENTAL)"""
+        async with self.connect() as db:
+            async with db.execute("PRAGMA auto_vacuum") as cursor:
+                mode = (await cursor.fetchone())[0]
+            if mode != 2:
+                # Полный VACUUM держит блокировку записи дольше SQLITE_TIMEOUT:
+                # внутри живого бота его не делаем, это разовое обслуживание
+                if not self._vacuum_warned:
+                    print(f"⚠️ {self.path}: база создана без auto_vacuum=INCREMENTAL, место не возвращается. "
+                          "Остановите бота и выполните: python database.py --vacuum")
+                    self._vacuum_warned = True
+                return
+            # Через execute прагма освобождает одну страницу за шаг курсора;
+            # executescript прогоняет её до конца
+            pages = f"({int(max_pages)})" if max_pages else ""
+            await db.executescript(f"PRAGMA incremental_vacuum{pages};")
+
+    async def vacuum(self):
+        """Разовый полный VACUUM с переводом старого файла в auto_vacuum=INCREMENTAL"""
+        async with self.connect() as db:
+            await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await db.execute("VACUUM")
+
+    async def try_acquire_lease(self, name, holder, ttl_seconds):
+        now = time.time()
+        async with self.connect() as db:
+            cursor = await db.execute(
+                """
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+                """,
+                (name, holder, now + ttl_seconds, now)
+            )
+            await db.commit()
+            return cursor.rowcount > 0
+
 
+_storage = None
+_storage_pinned = False
 
+def get_storage():
+    """Текущее хранилище. SQLite пересоздаётся, если поменяли DB_NAME (так делают тесты)."""
+    global _storage
+    if _storage_pinned:
+        return _storage
+    if DATABASE_URL.startswith(("postgres://", "postgresql://")):
+        if _storage is None:
+            from database_pg import PostgresStorage
+            _storage = PostgresStorage(DATABASE_URL)
+    elif _storage is None or _storage.path != DB_NAME:
+        _storage = SQLiteStorage(DB_NAME)
+    return _storage
 
+def set_storage(storage):
+    """Подменить хранилище явно (None — вернуться к выбору по DATABASE_URL)"""
+    global _storage, _storage_pinned
+    _storage = storage
+    _storage_pinned = storage is not None
+
+
+async def init_db():
+    await get_storage().init_db()
+
+@traced("db.create_promocode")
 async def create_promocode(admin_id):
     code = str(uuid.uuid4())[:8].upper()
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("INSERT INTO promocodes (code, created_by) VALUES (?, ?)", (code, admin_id))
-        await db.commit()
+    await get_storage().insert_promocode(code, admin_id)
     return code
 
+@traced("db.check_user_access")
 async def check_user_access(user_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        async with db.execute("SELECT is_active FROM users WHERE user_id = ?", (user_id,)) as cursor:
-            row = await cursor.fetchone()
-            if row and row[0]:
-                return True
-    return False
+    return await get_storage().check_user_access(user_id)
 
+@traced("db.activate_user")
 async def activate_user(user_id, code_input):
     code_input = code_input.strip().upper()
-    async with aiosqlite.connect(DB_NAME) as db:
-        async with db.execute("SELECT is_used FROM promocodes WHERE code = ?", (code_input,)) as cursor:
-            row = await cursor.fetchone()
-            
-            if not row:
-                return False, "❌ Такого кода не существует."
-            if row[0]:
-                return False, "❌ Код уже использован."
-
-        await db.execute("UPDATE promocodes SET is_used = 1, used_by = ? WHERE code = ?", (user_id, code_input))
-
-        await db.execute("""
-            INSERT INTO users (user_id, is_active, activated_at) 
-            VALUES (?, 1, ?) 
-            ON CONFLICT(user_id) DO UPDATE SET is_active=1
-        """, (user_id, datetime.now()))
-        
-        await db.commit()
-        return True, "✅ Доступ активирован! Добро пожаловать."
+    result = await get_storage().redeem_promocode(user_id, code_input)
+    if result == "missing":
+        return False, "❌ Такого кода не существует."
+    if result == "used":
+        return False, "❌ Код уже использован."
+    return True, "✅ Доступ активирован! Добро пожаловать."
 
+@traced("db.add_channel")
 async def add_channel(user_id, channel_tg_id, title):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute(
-            "INSERT INTO channels (user_id, channel_tg_id, title) VALUES (?, ?, ?)",
-            (user_id, channel_tg_id, title)
-        )
-        await db.commit()
+    await get_storage().add_channel(user_id, channel_tg_id, title)
 
+@traced("db.get_user_channels")
 async def get_user_channels(user_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM channels WHERE user_id = ?", (user_id,)) as cursor:
-            return await cursor.fetchall()
+    return await get_storage().get_user_channels(user_id)
 
+@traced("db.get_channel_by_id")
 async def get_channel_by_id(channel_db_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM channels WHERE id = ?", (channel_db_id,)) as cursor:
-            return await cursor.fetchone()
+    return await get_storage().get_channel_by_id(channel_db_id)
 
+@traced("db.add_style_example")
 async def add_style_example(channel_id, text):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("INSERT INTO style_examples (channel_id, text) VALUES (?, ?)", (channel_id, text))
-        await db.commit()
+    await get_storage().add_style_example(channel_id, text)
 
+@traced("db.clear_style_examples")
 async def clear_style_examples(channel_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("DELETE FROM style_examples WHERE channel_id = ?", (channel_id,))
-        await db.commit()
+    await get_storage().clear_style_examples(channel_id)
 
+@traced("db.get_style_prompt")
 async def get_style_prompt(channel_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        async with db.execute("SELECT text FROM style_examples WHERE channel_id = ? ORDER BY RANDOM() LIMIT 7", (channel_id,)) as cursor:
-            rows = await cursor.fetchall()
-            if not rows: return ""
-            return "\n---\n".join([r[0] for r in rows])
+    texts = await get_storage().get_style_examples(channel_id, 7)
+    if not texts: return ""
+    return "\n---\n".join(texts)
 
+@traced("db.add_post_to_schedule")
 async def add_post_to_schedule(channel_id, text, pub_date, media_id=None, media_type=None):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute(
-            "INSERT INTO schedule (channel_id, post_text, publish_date, media_file_id, media_type, is_published) VALUES (?, ?, ?, ?, ?, 0)", 
-            (channel_id, text, pub_date, media_id, media_type)
-        )
-        await db.commit()
+    await get_storage().add_post_to_schedule(channel_id, text, pub_date, media_id, media_type)
 
+@traced("db.get_due_posts")
 async def get_due_posts(current_time):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            """
-            SELECT s.*, c.channel_tg_id 
-            FROM schedule s 
-            JOIN channels c ON s.channel_id = c.id 
-            WHERE s.is_published = 0 AND s.publish_date <= ?
-            """, 
-            (current_time,)
-        ) as cursor:
-            return await cursor.fetchall()
+    return await get_storage().get_due_posts(current_time)
+
+@traced("db.claim_due_posts")
+async def claim_due_posts(current_time, limit=100):
+    """Забрать посты к публикации: пока claim не истёк, другие процессы их не видят"""
+    return await get_storage().claim_due_posts(current_time, limit, CLAIM_SECONDS)
 
+@traced("db.mark_as_published")
 async def mark_as_published(post_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("UPDATE schedule SET is_published = 1 WHERE id = ?", (post_id,))
-        await db.commit()
+    await get_storage().mark_as_published(post_id)
 
+@traced("db.get_last_scheduled_date")
 async def get_last_scheduled_date(channel_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        async with db.execute("SELECT MAX(publish_date) FROM schedule WHERE is_published = 0 AND channel_id = ?", (channel_id,)) as cursor:
-            row = await cursor.fetchone()
-            if row and row[0]:
-                try:
-                    return datetime.fromisoformat(str(row[0]))
-                except:
-                    try: return datetime.strptime(str(row[0]), "%Y-%m-%d %H:%M:%S")
-                    except: return None
-            return None
+    value = await get_storage().get_last_scheduled_date(channel_id)
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except:
+        try: return datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S")
+        except: return None
 
+@traced("db.get_all_pending_posts")
 async def get_all_pending_posts(channel_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM schedule WHERE is_published = 0 AND channel_id = ? ORDER BY publish_date ASC", (channel_id,)) as cursor:
-            return await cursor.fetchall()
+    return await get_storage().get_all_pending_posts(channel_id)
 
+@traced("db.delete_post")
 async def delete_post(post_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("DELETE FROM schedule WHERE id = ?", (post_id,))
-        await db.commit()
+    await get_storage().delete_post(post_id)
 
+@traced("db.get_recent_generated_posts")
 async def get_recent_generated_posts(channel_id, limit=10):
-    async with aiosqlite.connect(DB_NAME) as db:
-        async with db.execute("SELECT post_text FROM schedule WHERE channel_id = ? ORDER BY id DESC LIMIT ?", (channel_id, limit)) as cursor:
-            rows = await cursor.fetchall()
-            if not rows: return "No history yet."
-            return "\n---\n".join([str(r[0])[:200] + "..." for r in rows])
+    texts = await get_storage().get_recent_post_texts(channel_id, limit)
+    if not texts: return "No history yet."
+    return "\n---\n".join([str(t)[:200] + "..." for t in texts])
 
+@traced("db.get_scheduled_post")
 async def get_scheduled_post(post_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM schedule WHERE id = ?", (post_id,)) as cursor:
-            return await cursor.fetchone()
+    return await get_storage().get_scheduled_post(post_id)
 
+@traced("db.update_scheduled_post_text")
 async def update_scheduled_post_text(post_id, new_text):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("UPDATE schedule SET post_text = ? WHERE id = ?", (new_text, post_id))
-        await db.commit()
+    await get_storage().update_scheduled_post_text(post_id, new_text)
 
+@traced("db.update_scheduled_post_media")
 async def update_scheduled_post_media(post_id, media_id, media_type):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute(
-            "UPDATE schedule SET media_file_id = ?, media_type = ? WHERE id = ?", 
-            (media_id, media_type, post_id)
-        )
-        await db.commit()
\ No newline at end of file
+    await get_storage().update_scheduled_post_media(post_id, media_id, media_type)
+
+@traced("db.get_channel_stats")
+async def get_channel_stats(channel_id):
+    """Сколько опубликовано (включая архив), сколько ждёт и сколько в архиве"""
+    return await get_storage().get_channel_stats(channel_id)
+
+@traced("db.archive_published_posts")
+async def archive_published_posts(days=None):
+    """Переносит опубликованные посты старше days дней в архив короткими пачками и ужимает базу"""
+    days = RETENTION_DAYS if days is None else days
+    cutoff = datetime.now() - timedelta(days=days)
+    storage = get_storage()
+    moved = 0
+    while True:
+        batch = await storage.archive_published_posts(cutoff, ARCHIVE_BATCH_SIZE)
+        moved += batch
+        if batch < ARCHIVE_BATCH_SIZE:
+            break
+    if moved:
+        await storage.compact()
+    return moved
+
+@traced("db.set_news_topics")
+async def set_news_topics(channel_id, queries, region="ru-ru"):
+    """Заменяет темы автопилота канала"""
+    storage = get_storage()
+    await storage.clear_news_topics(channel_id)
+    for query in queries:
+        await storage.add_news_topic(channel_id, query, region)
+
+@traced("db.get_news_topics")
+async def get_news_topics(channel_id):
+    return await get_storage().get_news_topics(channel_id)
+
+@traced("db.get_autopilot_channel_ids")
+async def get_autopilot_channel_ids():
+    return await get_storage().get_autopilot_channel_ids()
+
+@traced("db.is_link_covered")
+async def is_link_covered(channel_id, url):
+    return await get_storage().is_link_covered(channel_id, url)
+
+@traced("db.mark_links_covered")
+async def mark_links_covered(channel_id, urls):
+    await get_storage().mark_links_covered(channel_id, urls)
+
+@traced("db.try_acquire_lease")
+async def try_acquire_lease(name, holder, ttl_seconds):
+    """Захват или продление аренды. True — держатель теперь holder."""
+    return await get_storage().try_acquire_lease(name, holder, ttl_seconds)
+
+@traced("db.vacuum")
+async def vacuum_db():
+    """Полное обслуживание базы. Запускать при остановленном боте."""
+    await get_storage().vacuum()
+
+
+if __name__ == "__main__":
+    import asyncio
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Обслуживание базы бота")
+    parser.add_argument("--vacuum", action="store_true", help="полный VACUUM (бот должен быть остановлен)")
+    args = parser.parse_args()
+    if args.vacuum:
+        asyncio.run(vacuum_db())
+        print("🧹 VACUUM выполнен")
+    else:
+        parser.print_help()
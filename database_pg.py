@@ -0,0 +1,341 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+
+import asyncpg
+
+POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+
+
+class PostgresStorage:
+    """Хранилище на PostgreSQL через пул asyncpg. Методы те же, что у SQLiteStorage."""
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(self.dsn, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE)
+        return self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def init_db(self):
+        pool = await self.pool()
+        async with pool.acquire() as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS channels (
+                    id SERIAL PRIMARY KEY,
+                    user_id BIGINT,
+                    channel_tg_id TEXT,
+                    title TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS style_examples (
+                    id SERIAL PRIMARY KEY,
+                    channel_id INTEGER,
+                    text TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS schedule (
+                    id SERIAL PRIMARY KEY,
+                    channel_id INTEGER,
+                    post_text TEXT,
+                    media_file_id TEXT,
+                    media_type TEXT,
+                    publish_date TIMESTAMP,
+                    is_published BOOLEAN DEFAULT FALSE,
+                    claimed_until DOUBLE PRECISION
+                );
+
+                CREATE INDEX IF NOT EXISTS schedule_pending_idx
+                    ON schedule (publish_date) WHERE NOT is_published;
+
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id BIGINT PRIMARY KEY,
+                    is_active BOOLEAN DEFAULT FALSE,
+                    activated_at TIMESTAMP
+                );
+
+                CREATE TABLE IF NOT EXISTS promocodes (
+                    code TEXT PRIMARY KEY,
+                    created_by BIGINT,
+                    is_used BOOLEAN DEFAULT FALSE,
+                    used_by BIGINT
+                );
+
+                CREATE TABLE IF NOT EXISTS schedule_archive (
+                    id INTEGER PRIMARY KEY,
+                    channel_id INTEGER,
+                    post_text TEXT,
+                    media_file_id TEXT,
+                    media_type TEXT,
+                    publish_date TIMESTAMP,
+                    archived_at TIMESTAMP
+                );
+
+                CREATE INDEX IF NOT EXISTS schedule_archive_channel_idx
+                    ON schedule_archive (channel_id, id);
+
+                CREATE TABLE IF NOT EXISTS news_topics (
+                    id SERIAL PRIMARY KEY,
+                    channel_id INTEGER,
+                    query TEXT,
+                    region TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS covered_links (
+                    channel_id INTEGER,
+                    url TEXT,
+                    covered_at TIMESTAMP,
+                    PRIMARY KEY (channel_id, url)
+                );
+
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT,
+                    expires_at DOUBLE PRECISION
+                );
+            """)
+
+    async def insert_promocode(self, code, admin_id):
+        pool = await self.pool()
+        await pool.execute("INSERT INTO promocodes (code, created_by) VALUES ($1, $2)", code, admin_id)
+
+    async def check_user_access(self, user_id):
+        pool = await self.pool()
+        return bool(await pool.fetchval("SELECT is_active FROM users WHERE user_id = $1", user_id))
+
+    async def redeem_promocode(self, user_id, code):
+        pool = await self.pool()
+        async with pool.acquire() as db:
+            async with db.transaction():
+                row = await db.fetchrow("SELECT is_used FROM promocodes WHERE code = $1 FOR UPDATE", code)
+                if not row:
+                    return "missing"
+                if row['is_used']:
+                    return "used"
+
+                await db.execute("UPDATE promocodes SET is_used = TRUE, used_by = $1 WHERE code = $2", user_id, code)
+                await db.execute("""
+                    INSERT INTO users (user_id, is_active, activated_at)
+                    VALUES ($1, TRUE, $2)
+                    ON CONFLICT(user_id) DO UPDATE SET is_active = TRUE
+                """, user_id, datetime.now())
+                return "ok"
+
+    async def add_channel(self, user_id, channel_tg_id, title):
+        pool = await self.pool()
+        await pool.execute(
+            "INSERT INTO channels (user_id, channel_tg_id, title) VALUES ($1, $2, $3)",
+            user_id, channel_tg_id, title
+        )
+
+    async def get_user_channels(self, user_id):
+        pool = await self.pool()
+        return await pool.fetch("SELECT * FROM channels WHERE user_id = $1", user_id)
+
+    async def get_channel_by_id(self, channel_db_id):
+        pool = await self.pool()
+        return await pool.fetchrow("SELECT * FROM channels WHERE id = $1", channel_db_id)
+
+    async def add_style_example(self, channel_id, text):
+        pool = await self.pool()
+        await pool.execute("INSERT INTO style_examples (channel_id, text) VALUES ($1, $2)", channel_id, text)
+
+    async def clear_style_examples(self, channel_id):
+        pool = await self.pool()
+        await pool.execute("DELETE FROM style_examples WHERE channel_id = $1", channel_id)
+
+    async def get_style_examples(self, channel_id, limit):
+        pool = await self.pool()
+        rows = await pool.fetch("SELECT text FROM style_examples WHERE channel_id = $1 ORDER BY RANDOM() LIMIT $2", channel_id, limit)
+        return [r[0] for r in rows]
+
+    async def add_post_to_schedule(self, channel_id, text, pub_date, media_id=None, media_type=None):
+        pool = await self.pool()
+        await pool.execute(
+            "INSERT INTO schedule (channel_id, post_text, publish_date, media_file_id, media_type, is_published) VALUES ($1, $2, $3, $4, $5, FALSE)",
+            channel_id, text, pub_date, media_id, media_type
+        )
+
+    async def get_due_posts(self, current_time):
+        pool = await self.pool()
+        return await pool.fetch(
+            """
+            SELECT s.*, c.channel_tg_id
+            FROM schedule s
+            JOIN channels c ON s.channel_id = c.id
+            WHERE NOT s.is_published AND s.publish_date <= $1
+            """,
+            current_time
+        )
+
+    async def claim_due_posts(self, current_time, limit, claim_seconds):
+        now = time.time()
+        pool = await self.pool()
+        # SKIP LOCKED: параллельные публикаторы разбирают разные строки, не дожидаясь друг друга
+        return await pool.fetch(
+            """
+            WITH due AS (
+                SELECT id FROM schedule
+                WHERE NOT is_published AND publish_date <= $1
+                  AND (claimed_until IS NULL OR claimed_until < $2)
+                ORDER BY publish_date
+                LIMIT $3
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE schedule s SET claimed_until = $4
+            FROM due, channels c
+            WHERE s.id = due.id AND c.id = s.channel_id
+            RETURNING s.*, c.channel_tg_id
+            """,
+            current_time, now, limit, now + claim_seconds
+        )
+
+    async def mark_as_published(self, post_id):
+        pool = await self.pool()
+        await pool.execute("UPDATE schedule SET is_published = TRUE WHERE id = $1", post_id)
+
+    async def get_last_scheduled_date(self, channel_id):
+        pool = await self.pool()
+        return await pool.fetchval("SELECT MAX(publish_date) FROM schedule WHERE NOT is_published AND channel_id = $1", channel_id)
+
+    async def get_all_pending_posts(self, channel_id):
+        pool = await self.pool()
+        return await pool.fetch("SELECT * FROM schedule WHERE NOT is_published AND channel_id = $1 ORDER BY publish_date ASC", channel_id)
+
+    async def delete_post(self, post_id):
+        pool = await self.pool()
+        await pool.execute("DELETE FROM schedule WHERE id = $1", post_id)
+
+    async def get_recent_post_texts(self, channel_id, limit):
+        pool = await self.pool()
+        rows = await pool.fetch(
+            """
+            SELECT post_text FROM (
+                SELECT id, post_text FROM schedule WHERE channel_id = $1
+                UNION ALL
+                SELECT id, post_text FROM schedule_archive WHERE channel_id = $1
+            ) t ORDER BY id DESC LIMIT $2
+            """,
+            channel_id, limit
+        )
+        return [r[0] for r in rows]
+
+    async def get_scheduled_post(self, post_id):
+        pool = await self.pool()
+        return await pool.fetchrow("SELECT * FROM schedule WHERE id = $1", post_id)
+
+    async def update_scheduled_post_text(self, post_id, new_text):
+        pool = await self.pool()
+        await pool.execute("UPDATE schedule SET post_text = $1 WHERE id = $2", new_text, post_id)
+
+    async def update_scheduled_post_media(self, post_id, media_id, media_type):
+        pool = await self.pool()
+        await pool.execute(
+            "UPDATE schedule SET media_file_id = $1, media_type = $2 WHERE id = $3",
+            media_id, media_type, post_id
+        )
+
+    async def get_channel_stats(self, channel_id):
+        pool = await self.pool()
+        row = await pool.fetchrow(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM schedule WHERE channel_id = $1 AND is_published)
+                    + (SELECT COUNT(*) FROM schedule_archive WHERE channel_id = $1) AS published,
+                (SELECT COUNT(*) FROM schedule WHERE channel_id = $1 AND NOT is_published) AS pending,
+                (SELECT COUNT(*) FROM schedule_archive WHERE channel_id = $1) AS archived
+            """,
+            channel_id
+        )
+        return dict(row)
+
+    async def add_news_topic(self, channel_id, query, region):
+        pool = await self.pool()
+        await pool.execute("INSERT INTO news_topics (channel_id, query, region) VALUES ($1, $2, $3)", channel_id, query, region)
+
+    async def clear_news_topics(self, channel_id):
+        pool = await self.pool()
+        await pool.execute("DELETE FROM news_topics WHERE channel_id = $1", channel_id)
+
+    async def get_news_topics(self, channel_id):
+        pool = await self.pool()
+        return await pool.fetch("SELECT * FROM news_topics WHERE channel_id = $1 ORDER BY id", channel_id)
+
+    async def get_autopilot_channel_ids(self):
+        pool = await self.pool()
+        rows = await pool.fetch("SELECT DISTINCT channel_id FROM news_topics ORDER BY channel_id")
+        return [r[0] for r in rows]
+
+    async def is_link_covered(self, channel_id, url):
+        pool = await self.pool()
+        return await pool.fetchval("SELECT 1 FROM covered_links WHERE channel_id = $1 AND url = $2", channel_id, url) is not None
+
+    async def mark_links_covered(self, channel_id, urls):
+        pool = await self.pool()
+        now = datetime.now()
+        await pool.executemany(
+            "INSERT INTO covered_links (channel_id, url, covered_at) VALUES ($1, $2, $3) ON CONFLICT DO NOTHING",
+            [(channel_id, url, now) for url in urls]
+        )
+
+    async def archive_published_posts(self, cutoff, batch_size):
+        pool = await self.pool()
+        # Как INSERT OR REPLACE в SQLite: конфликтная строка перезаписывается, а не теряется.
+        # Считаем удалённые из schedule, иначе конфликты оборвали бы цикл пачек раньше времени.
+        return await pool.fetchval(
+            """
+            WITH moved AS (
+                DELETE FROM schedule WHERE id IN (
+                    SELECT id FROM schedule
+                    WHERE is_published AND publish_date < $1
+                    ORDER BY id LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, channel_id, post_text, media_file_id, media_type, publish_date
+            ), archived AS (
+                INSERT INTO schedule_archive (id, channel_id, post_text, media_file_id, media_type, publish_date, archived_at)
+                SELECT *, $3::timestamp FROM moved
+                ON CONFLICT (id) DO UPDATE SET
+                    channel_id = excluded.channel_id, post_text = excluded.post_text,
+                    media_file_id = excluded.media_file_id, media_type = excluded.media_type,
+                    publish_date = excluded.publish_date, archived_at = excluded.archived_at
+            )
+            SELECT count(*) FROM moved
+            """,
+            cutoff, batch_size, datetime.now()
+        )
+
+    async def compact(self, max_pages=None):
+        # Место от удалённых строк переиспользует autovacuum; обновим только статистику
+        pool = await self.pool()
+        await pool.execute("ANALYZE schedule")
+
+    async def vacuum(self):
+        pool = await self.pool()
+        await pool.execute("VACUUM ANALYZE schedule")
+        await pool.execute("VACUUM ANALYZE schedule_archive")
+
+    async def try_acquire_lease(self, name, holder, ttl_seconds):
+        now = time.time()
+        pool = await self.pool()
+        status = await pool.execute(
+            """
+            INSERT INTO leases (name, holder, expires_at) VALUES ($1, $2, $3)
+            ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE leases.holder = excluded.holder OR leases.expires_at < $4
+            """,
+            name, holder, now + ttl_seconds, now
+        )
+        return status.endswith(" 1")
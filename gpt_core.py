@@ -1,19 +1,16 @@
-import os
-import json
 import asyncio
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 from database import get_style_prompt, get_recent_generated_posts
+from tracing import span, traced
+from llm_json import parse_posts, strip_fences
+from llm_router import LLMRouter, providers_from_env
 
 load_dotenv()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+CONTINUE_PROMPT = "Continue exactly where you stopped. Output only the remaining JSON, no repetition."
 
-client = AsyncOpenAI(
-    api_key=GROQ_API_KEY,
-    base_url="https://api.groq.com/openai/v1"
-)
+# Серии постов пишет большая модель, рерайт — быстрая (см. llm_router.py)
+router = LLMRouter(providers_from_env())
 
 def analyze_style_metrics(style_text):
     if not style_text: return "Standard blog post"
@@ -24,6 +21,7 @@ def analyze_style_metrics(style_text):
     if avg_len > 150: return "Deep storytelling, long-reads"
     return "Standard Instagram/Telegram caption size"
 
+@traced("gpt.split_content_to_posts")
 async def split_content_to_posts(user_text, channel_id):
     style_instruction = await get_style_prompt(channel_id)
     length_guide = analyze_style_metrics(style_instruction)
@@ -68,39 +66,55 @@ async def split_content_to_posts(user_text, channel_id):
         "Strictly follow the author's gender (Male/Female) based on the samples provided."
     )
 
+    messages = [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": prompt}
+    ]
+
     try:
-        response = await client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": system_instruction},
-                {"role": "user", "content": prompt}
-            ],
+        response, route = await router.chat(
+            "large",
+            messages,
             temperature=0.7, 
             response_format={"type": "json_object"}
         )
 
         response_text = response.choices[0].message.content.strip()
-        data = json.loads(response_text)
-        
-        if "posts" in data and isinstance(data["posts"], list):
-            return [str(p) for p in data["posts"]]
-        
-        for key, value in data.items():
-            if isinstance(value, list):
-                return [str(v) for v in value]
-        return []
+        with span("llm.parse_json"):
+            posts, complete = parse_posts(response_text)
+
+        if not posts and not complete:
+            # Оборвалось до первого целого поста: дозапрашиваем только хвост, а не всё заново
+            # Продолжать должна та же модель, что начала ответ
+            with span("llm.continue"):
+                continuation, _ = await router.chat(
+                    "large",
+                    messages + [
+                        {"role": "assistant", "content": response_text},
+                        {"role": "user", "content": CONTINUE_PROMPT}
+                    ],
+                    route=route,
+                    temperature=0.7
+                )
+            response_text += strip_fences(continuation.choices[0].message.content)
+            posts, complete = parse_posts(response_text)
+
+        if not complete:
+            print(f"⚠️ LLM: ответ оборван, спасено постов: {len(posts)}")
+        return posts
 
     except Exception as e:
-        print(f"❌ Groq Error: {e}")
+        print(f"❌ LLM Error: {e}")
         return []
 
+@traced("gpt.rewrite_post_gpt")
 async def rewrite_post_gpt(text, channel_id):
     """Рерайт"""
     style_instruction = await get_style_prompt(channel_id)
     try:
-        response = await client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
+        response, _ = await router.chat(
+            "fast",
+            [
                 {"role": "system", "content": f"You are a professional editor. Rewrite this text to match this style. CHECK THE GENDER (Male/Female) in the style samples and fix any gender errors:\n{style_instruction}"},
                 {"role": "user", "content": text}
             ],
@@ -0,0 +1,137 @@
+"""Терпимый разбор ответа LLM вида {"posts": ["...", "..."]}.
+
+Модель иногда оборачивает JSON в ```-блок, добавляет текст вокруг, ставит
+висячие запятые, вставляет сырые переносы строк в строки или обрывается
+на max_tokens. Вместо json.loads «всё или ничего» массив постов читается
+поэлементно: всё, что успело прийти целиком, сохраняется.
+"""
+import re
+import json
+
+MIN_POST_LENGTH = 20
+# Ключи, под которыми модель кладёт текст, если вернула посты объектами
+TEXT_KEYS = ("text", "post", "content", "body")
+
+_decoder = json.JSONDecoder(strict=False)
+_POSTS_KEY_RE = re.compile(r'"posts"\s*:\s*\[')
+_UNESCAPED_QUOTE_RE = re.compile(r'(?<!\\)"')
+
+
+def strip_fences(text):
+    """Снимает обёртку ```json ... ``` (закрывающей может не быть)"""
+    stripped = text.strip()
+    if not (stripped.startswith("```") or stripped.endswith("```")):
+        return text
+    text = stripped
+    if text.startswith("```"):
+        newline = text.find("\n")
+        text = text[newline + 1:] if newline != -1 else text.lstrip("`json")
+    if text.endswith("```"):
+        text = text[:-3]
+    return text
+
+
+def validate_post(value):
+    """Схема элемента: строка или объект с текстовым полем, не короче MIN_POST_LENGTH"""
+    if isinstance(value, dict):
+        value = next((value[k] for k in TEXT_KEYS if isinstance(value.get(k), str)), None)
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value if len(value) >= MIN_POST_LENGTH else None
+
+
+def _find_array(text):
+    """Позиция сразу после '[' массива постов или None"""
+    match = _POSTS_KEY_RE.search(text)
+    if match:
+        return match.end()
+    start = text.find("[")
+    return start + 1 if start != -1 else None
+
+
+def _repair_tail(fragment):
+    """Незакрытая последняя строка: (пост или None, закрыт ли массив после неё).
+
+    Чиним только забытую кавычку перед ]}. Если ответ просто оборвался,
+    недописанный пост выбрасываем: лучше дозапросить, чем показать обрубок.
+    """
+    if _UNESCAPED_QUOTE_RE.search(fragment):
+        return None, False
+    body = fragment.rstrip()
+    closer = re.search(r"\s*\]\s*\}?$", body)
+    if not closer:
+        return None, False
+    try:
+        value = json.loads('"' + body[:closer.start()] + '"', strict=False)
+    except ValueError:
+        return None, False
+    return validate_post(value), True
+
+
+def iter_posts(text):
+    """Отдаёт (пост, None) для каждого целого элемента и в конце (None, complete).
+
+    complete=False значит, что массив оборвался и часть постов могла потеряться.
+    """
+    text = strip_fences(text)
+    pos = _find_array(text)
+    if pos is None:
+        # Без массива оборванным считаем только пустой ответ или начатый JSON;
+        # отказ прозой модель уже договорила, дозапрос его не исправит
+        yield None, bool(text.strip()) and "{" not in text
+        return
+
+    length = len(text)
+    while True:
+        # Разделители и висячие запятые
+        while pos < length and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= length:
+            yield None, False
+            return
+        if text[pos] == "]":
+            yield None, True
+            return
+        try:
+            value, pos = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            if text[pos] != '"':
+                yield None, False
+                return
+            post, closed = _repair_tail(text[pos + 1:])
+            if post is not None:
+                yield post, None
+            yield None, closed
+            return
+        post = validate_post(value)
+        if post is not None:
+            yield post, None
+
+
+def parse_posts(text):
+    """(посты, complete). Целый корректный JSON разбирается одним json.loads."""
+    try:
+        data = json.loads(strip_fences(text), strict=False)
+    except ValueError:
+        data = None
+
+    if isinstance(data, dict):
+        items = data.get("posts")
+        if not isinstance(items, list):
+            items = next((v for v in data.values() if isinstance(v, list)), [])
+        return [p for p in map(validate_post, items) if p is not None], True
+    elif isinstance(data, list):
+        return [p for p in map(validate_post, data) if p is not None], True
+    elif data is not None:
+        # Целый JSON без постов ("..." или число): ответ закончен, дозапрашивать нечего
+        return [], True
+
+    posts = []
+    complete = False
+    for post, done in iter_posts(text):
+        if post is None:
+            complete = done
+        else:
+            posts.append(post)
+    return posts, complete
@@ -0,0 +1,159 @@
+"""Маршрутизация запросов к LLM между несколькими OpenAI-совместимыми провайдерами.
+
+У каждого провайдера есть модели по уровням: "fast" (рерайт, короткие
+правки) и "large" (генерация серий постов). Для каждой пары
+(провайдер, модель) ведётся EWMA задержки и доли ошибок; запрос идёт в
+самую быструю здоровую пару, при ошибке — в следующую.
+"""
+import os
+import json
+import time
+import logging
+from dotenv import load_dotenv
+
+from tracing import span
+
+load_dotenv()
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+EWMA_ALPHA = 0.3
+# Во сколько раз ошибки «удлиняют» задержку при выборе
+ERROR_PENALTY = 4.0
+# Штраф за ошибки затухает со временем, иначе маршрут после одного сбоя
+# проигрывает запасному навсегда и больше не получает запросов
+ERROR_HALF_LIFE = 60.0
+COOLDOWN_BASE = 5.0
+COOLDOWN_MAX = 300.0
+
+
+class Provider:
+    def __init__(self, name, base_url, api_key, models):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.models = models  # {"fast": "...", "large": "..."}
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            # Повторы делает роутер (в другого провайдера), а не клиент
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+
+class RouteStats:
+    __slots__ = ("latency", "error_rate", "failures", "cooldown_until", "error_updated")
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.error_updated = 0.0
+
+    def current_error_rate(self, now):
+        return self.error_rate * 0.5 ** ((now - self.error_updated) / ERROR_HALF_LIFE)
+
+    def record_success(self, latency, now):
+        self.latency = latency if self.latency is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+        self.error_rate = (1 - EWMA_ALPHA) * self.current_error_rate(now)
+        self.error_updated = now
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def record_failure(self, now, rate_limited=False):
+        self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.current_error_rate(now)
+        self.error_updated = now
+        self.failures += 1
+        cooldown = COOLDOWN_BASE * 2 ** (self.failures - 1) * (4 if rate_limited else 1)
+        self.cooldown_until = now + min(cooldown, COOLDOWN_MAX)
+
+    def score(self, now):
+        # Неизмеренный маршрут получает 0, чтобы его один раз попробовали
+        return (self.latency or 0.0) * (1 + ERROR_PENALTY * self.current_error_rate(now))
+
+
+class LLMRouter:
+    def __init__(self, providers):
+        self.providers = providers
+        self.stats = {}
+
+    def routes(self, tier):
+        """Пары (провайдер, модель) уровня tier: сначала здоровые по score, потом остывающие"""
+        now = time.monotonic()
+        candidates = []
+        for order, provider in enumerate(self.providers):
+            model = provider.models.get(tier)
+            if not model:
+                continue
+            stats = self.stats.setdefault((provider.name, model), RouteStats())
+            cooling = stats.cooldown_until > now
+            candidates.append((cooling, stats.cooldown_until if cooling else stats.score(now), order, provider, model))
+        candidates.sort(key=lambda c: c[:3])
+        return [(provider, model) for *_, provider, model in candidates]
+
+    async def chat(self, tier, messages, route=None, **kwargs):
+        """(ответ, маршрут). route прибивает запрос к конкретной паре, без фейловера."""
+        routes = [route] if route else self.routes(tier)
+        if not routes:
+            raise RuntimeError(f"Нет провайдеров для уровня '{tier}'")
+
+        last_error = None
+        for provider, model in routes:
+            stats = self.stats.setdefault((provider.name, model), RouteStats())
+            started = time.monotonic()
+            try:
+                with span("llm.chat_completion", provider=provider.name, model=model) as s:
+                    response = await provider.client.chat.completions.create(
+                        model=model, messages=messages, timeout=LLM_TIMEOUT, **kwargs
+                    )
+                    if s and response.usage:
+                        s.set(completion_tokens=response.usage.completion_tokens)
+            except Exception as e:
+                rate_limited = getattr(e, "status_code", None) == 429
+                stats.record_failure(time.monotonic(), rate_limited)
+                logging.warning(f"⚠️ LLM {provider.name}/{model} недоступна: {e}")
+                last_error = e
+                continue
+            finished = time.monotonic()
+            stats.record_success(finished - started, finished)
+            return response, (provider, model)
+        raise last_error
+
+    def snapshot(self):
+        now = time.monotonic()
+        return {
+            f"{name}/{model}": {"latency": s.latency, "error_rate": round(s.current_error_rate(now), 3), "failures": s.failures}
+            for (name, model), s in self.stats.items()
+        }
+
+
+def providers_from_env():
+    """Провайдеры из LLM_PROVIDERS (JSON-список) или из ключей Groq/Gemini"""
+    raw = os.getenv("LLM_PROVIDERS")
+    if raw:
+        return [
+            Provider(p["name"], p["base_url"], os.getenv(p.get("api_key_env", ""), p.get("api_key", "")), p["models"])
+            for p in json.loads(raw)
+        ]
+
+    providers = []
+    if os.getenv("GROQ_API_KEY"):
+        providers.append(Provider(
+            "groq", "https://api.groq.com/openai/v1", os.getenv("GROQ_API_KEY"),
+            {
+                "fast": os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant"),
+                "large": os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+            }
+        ))
+    if os.getenv("GEMINI_API_KEY"):
+        providers.append(Provider(
+            "gemini", "https://generativelanguage.googleapis.com/v1beta/openai/", os.getenv("GEMINI_API_KEY"),
+            {
+                "fast": os.getenv("GEMINI_FAST_MODEL", "gemini-2.0-flash-lite"),
+                "large": os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
+            }
+        ))
+    return providers
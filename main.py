@@ -1,7 +1,8 @@
 import asyncio
 import os
+import socket
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from dotenv import load_dotenv
 
 from aiogram import Bot, Dispatcher, types, F
@@ -10,17 +11,20 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, BotCommand
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from database import (
     init_db, add_style_example, clear_style_examples, 
-    add_post_to_schedule, get_due_posts, mark_as_published, 
+    add_post_to_schedule, claim_due_posts, mark_as_published, 
     get_last_scheduled_date, get_all_pending_posts, delete_post,
     add_channel, get_user_channels, get_channel_by_id,
     create_promocode, check_user_access, activate_user,
-    get_scheduled_post, update_scheduled_post_text, update_scheduled_post_media
+    get_scheduled_post, update_scheduled_post_text, update_scheduled_post_media,
+    try_acquire_lease, archive_published_posts, set_news_topics, get_news_topics
 )
 from gpt_core import split_content_to_posts, rewrite_post_gpt
+from tracing import span, traced, trace_bot_requests, trace_updates
+from autopilot import autopilot_job, next_publish_date, AUTOPILOT_INTERVAL_HOURS
+from outbox import Outbox
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -28,9 +32,19 @@ logging.basicConfig(level=logging.INFO)
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_IDS = [5705636679, 1561345883]
 
+# Публикует только держатель аренды: в кластере планировщик крутится в каждом воркере
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+PUBLISHER_LEASE_TTL = 90
+
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher(storage=MemoryStorage())
-scheduler = AsyncIOScheduler()
+# Пачки сообщений хендлеров идут через очередь с лимитами (см. outbox.py)
+outbox = Outbox(bot)
+# APScheduler импортируется и создаётся в start_scheduler(), а не при импорте модуля
+scheduler = None
+
+bot.session.middleware(trace_bot_requests)
+dp.update.outer_middleware(trace_updates)
 
 class BotStates(StatesGroup):
     waiting_for_promo = State()
@@ -43,6 +57,9 @@ class BotStates(StatesGroup):
     
     generation_select_channel = State()
 
+    news_select_channel = State()
+    news_input_topics = State()
+
     queue_waiting_for_media = State()
 
 
@@ -148,7 +165,8 @@ async def cb_queue_show(callback: types.CallbackQuery):
         await callback.answer("Очередь пуста 📭", show_alert=True)
         return
         
-    await callback.message.answer(f"📅 **Очередь (всего {len(posts)}):**", parse_mode="Markdown")
+    chat_id = callback.message.chat.id
+    outbox.send_message(chat_id, f"📅 **Очередь (всего {len(posts)}):**", parse_mode="Markdown")
     for post in posts:
         pid = post['id']
         p_date = post['publish_date']
@@ -165,14 +183,16 @@ async def cb_queue_show(callback: types.CallbackQuery):
         preview = p_text[:150] + "..." if len(p_text) > 150 else p_text
 
         if media:
-             await callback.message.answer_photo(
+             outbox.send_photo(
+                chat_id,
                 media, 
                 caption=f"🕒 **{date_str}**\n{preview}",
                 reply_markup=get_queue_item_keyboard(pid),
                 parse_mode="Markdown"
              )
         else:
-            await callback.message.answer(
+            outbox.send_message(
+                chat_id,
                 f"🕒 **{date_str}**\n{preview}", 
                 reply_markup=get_queue_item_keyboard(pid),
                 parse_mode="Markdown"
@@ -253,6 +273,46 @@ async def cb_queue_image_finish(message: types.Message, state: FSMContext):
     await state.clear()
 
 
+@dp.message(Command("news"))
+async def cmd_news(message: types.Message, state: FSMContext):
+    """Темы новостного автопилота"""
+    user_id = message.from_user.id
+    if user_id not in ADMIN_IDS and not await check_user_access(user_id): return
+
+    channels = await get_user_channels(user_id)
+    if not channels:
+        await message.answer("❌ Нет каналов.")
+        return
+
+    await state.set_state(BotStates.news_select_channel)
+    await message.answer("📰 Для какого канала настроить автопилот?", reply_markup=get_channels_keyboard(channels, "news_"))
+
+@dp.callback_query(BotStates.news_select_channel, F.data.startswith("news_"))
+async def cb_news_select(callback: types.CallbackQuery, state: FSMContext):
+    channel_id = int(callback.data.split("_")[1])
+    topics = await get_news_topics(channel_id)
+    current = "\n".join(f"• {t['query']}" for t in topics) or "пока нет"
+
+    await state.update_data(active_channel_id=channel_id)
+    await state.set_state(BotStates.news_input_topics)
+    # Без parse_mode: темы пользовательские, «AI_news» или «C*» сломали бы Markdown
+    await callback.message.edit_text(
+        f"📰 Сейчас темы:\n{current}\n\nПришли новые темы, по одной на строку. «-» — выключить автопилот."
+    )
+
+@dp.message(BotStates.news_input_topics)
+async def process_news_topics(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    text = (message.text or "").strip()
+    queries = [] if text == "-" else [line.strip() for line in text.splitlines() if line.strip()]
+
+    await set_news_topics(data['active_channel_id'], queries)
+    await state.clear()
+    if queries:
+        await message.answer(f"✅ Автопилот включён, тем: {len(queries)}. Новости проверяются раз в {AUTOPILOT_INTERVAL_HOURS} ч.")
+    else:
+        await message.answer("⏸ Автопилот выключен.")
+
 @dp.callback_query(F.data == "cmd_add_channel")
 async def cb_add_channel(callback: types.CallbackQuery, state: FSMContext):
     await state.set_state(BotStates.waiting_for_channel_id)
@@ -262,7 +322,7 @@ async def cb_add_channel(callback: types.CallbackQuery, state: FSMContext):
 async def process_channel_id(message: types.Message, state: FSMContext):
     tg_id = message.text.strip()
     try:
-        chat_info = await bot.get_chat(tg_id)
+        chat_info = await message.bot.get_chat(tg_id)
         if chat_info.type != "channel":
             await message.answer("❌ Это не канал.")
             return
@@ -309,19 +369,20 @@ async def process_learning_text(message: types.Message, state: FSMContext):
 @dp.message(F.text & ~F.text.startswith("/"))
 async def handle_text_generation_init(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
-    if user_id not in ADMIN_IDS and not await check_user_access(user_id):
-        await message.answer("🔒 Нужен промокод.")
-        await state.set_state(BotStates.waiting_for_promo)
-        return
+    with span("handle_text_generation_init", user_id=user_id):
+        if user_id not in ADMIN_IDS and not await check_user_access(user_id):
+            await message.answer("🔒 Нужен промокод.")
+            await state.set_state(BotStates.waiting_for_promo)
+            return
 
-    channels = await get_user_channels(user_id)
-    if not channels: return
+        channels = await get_user_channels(user_id)
+        if not channels: return
 
-    await state.update_data(prompt_text=message.text)
-    if len(channels) == 1:
-        await run_generation(message, channels[0]['id'], message.text)
-    else:
-        await message.answer("Для какого канала?", reply_markup=get_channels_keyboard(channels, "gen_"))
+        await state.update_data(prompt_text=message.text)
+        if len(channels) == 1:
+            await run_generation(message, channels[0]['id'], message.text)
+        else:
+            await message.answer("Для какого канала?", reply_markup=get_channels_keyboard(channels, "gen_"))
 
 @dp.callback_query(F.data.startswith("gen_"))
 async def cb_gen_select(callback: types.CallbackQuery, state: FSMContext):
@@ -330,18 +391,21 @@ async def cb_gen_select(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.delete()
     await run_generation(callback.message, channel_id, data.get('prompt_text'))
 
+@traced("run_generation")
 async def run_generation(message, channel_id, text):
-    status = await message.answer("⏳ Groq пишет...")
+    chat_id = message.chat.id
+    status = outbox.status(chat_id, "⏳ Пишу...")
     posts = await split_content_to_posts(text, channel_id)
-    await status.delete()
-    
+
+    # Статус не удаляем, а превращаем в итог: один edit вместо delete + send
     if not posts:
-        await message.answer("❌ Ошибка API.")
+        outbox.replace(status, "❌ Ошибка API.")
         return
 
-    await message.answer("✅ Готово:")
+    outbox.replace(status, "✅ Готово:")
+    # Доставку видно по спанам tg.* внутри трейса апдейта: outbox отправляет в его контексте
     for post in posts:
-        await message.answer(post, reply_markup=get_post_actions_keyboard(channel_id))
+        outbox.send_message(chat_id, post, reply_markup=get_post_actions_keyboard(channel_id))
 
 @dp.callback_query(F.data.startswith("act_queue_"))
 async def cb_queue_add(callback: types.CallbackQuery):
@@ -349,12 +413,7 @@ async def cb_queue_add(callback: types.CallbackQuery):
     text = callback.message.text or callback.message.caption
     
     last_date = await get_last_scheduled_date(channel_id)
-    now = datetime.now()
-    target = (now + timedelta(days=1)).replace(hour=12, minute=0, second=0)
-    
-    if last_date and last_date > now:
-        target = last_date + timedelta(days=1)
-        target = target.replace(hour=12, minute=0, second=0)
+    target = next_publish_date(last_date, datetime.now())
         
     await add_post_to_schedule(channel_id, text, target)
     await callback.message.edit_text(f"✅ **В очереди на {target.strftime('%d.%m %H:%M')}**\n\n{text}", parse_mode="Markdown")
@@ -373,31 +432,68 @@ async def cb_del(callback: types.CallbackQuery):
     await callback.message.delete()
 
 async def scheduler_job():
+    if not await try_acquire_lease("publisher", WORKER_ID, PUBLISHER_LEASE_TTL):
+        return
     now = datetime.now()
-    posts = await get_due_posts(now)
+    posts = await claim_due_posts(now)
     for post in posts:
         try:
-            await bot.send_message(post['channel_tg_id'], post['post_text'])
+            # Посты в канал не склеиваем: каждый — отдельная публикация
+            await outbox.send_message(post['channel_tg_id'], post['post_text'], coalesce=False)
             await mark_as_published(post['id'])
         except Exception as e:
             print(f"❌ Ошибка публикации: {e}")
 
-async def main():
-    await init_db()
-    
+async def set_commands():
     commands = [
         BotCommand(command="start", description="🚀 Меню"),
         BotCommand(command="queue", description="📅 Очередь"),
+        BotCommand(command="news", description="📰 Автопилот новостей"),
         BotCommand(command="promo", description="🎟 Админ")
     ]
     await bot.set_my_commands(commands)
-    
+
+async def retention_job():
+    if not await try_acquire_lease("retention", WORKER_ID, 3600):
+        return
+    moved = await archive_published_posts()
+    if moved:
+        print(f"🗄 В архив перенесено постов: {moved}")
+
+async def news_autopilot_job():
+    if not await try_acquire_lease("autopilot", WORKER_ID, AUTOPILOT_INTERVAL_HOURS * 3600):
+        return
+    await autopilot_job()
+
+def start_scheduler():
+    global scheduler
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    scheduler = AsyncIOScheduler()
     scheduler.add_job(scheduler_job, "interval", minutes=1)
+    scheduler.add_job(retention_job, "interval", hours=6)
+    scheduler.add_job(news_autopilot_job, "interval", hours=AUTOPILOT_INTERVAL_HOURS)
     scheduler.start()
-    
+
+async def start_background():
+    """Планировщик и меню команд. Не отложены: успевают подняться до первого getUpdates"""
+    try:
+        start_scheduler()
+    except Exception as e:
+        # Без планировщика бот отвечает, но не публикует: об этом надо узнать сразу
+        logging.exception(f"❌ Планировщик не запустился, публикация остановлена: {e}")
+    try:
+        await set_commands()
+    except Exception as e:
+        print(f"❌ Не удалось обновить меню команд: {e}")
+
+async def main():
+    await init_db()
     await bot.delete_webhook(drop_pending_updates=True)
+
+    background = asyncio.create_task(start_background())
     print("🤖 Бот запущен (Access Control: ON)")
     await dp.start_polling(bot)
+    await background
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""Очередь исходящих сообщений в Telegram.
+
+Хендлеры не ждут Bot API, а кладут отправки сюда:
+
+* у каждого чата своя FIFO-очередь и свой token bucket, поверх — общий
+  лимит на процесс (в кластере лимит у каждого воркера свой);
+* TelegramRetryAfter ставит на паузу только этот чат и повторяет запрос;
+* подряд идущие простые сообщения (без клавиатуры) склеиваются в одно,
+  пока влезают в 4096 символов;
+* статус, который удалили или заменили до отправки, вообще не уходит в
+  API, а уже отправленный заменяется одним edit вместо delete + send.
+"""
+import os
+import time
+import asyncio
+import contextvars
+from collections import deque
+
+from aiogram.exceptions import TelegramRetryAfter
+
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "5"))
+# Сколько запросов очереди одновременно в полёте: не даём фоновым отправкам
+# занять все соединения сессии, которые нужны и самим хендлерам
+OUTBOX_MAX_IN_FLIGHT = int(os.getenv("OUTBOX_MAX_IN_FLIGHT", "20"))
+OUTBOX_MAX_RETRIES = 3
+MESSAGE_LIMIT = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+
+class RateLimiter:
+    """Token bucket: rate запросов в секунду, до burst подряд"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_to_full(self):
+        self._refill(time.monotonic())
+        return max(0.0, (self.burst - self.tokens) / self.rate, self.paused_until - time.monotonic())
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Outgoing:
+    """Запрос в очереди. await возвращает результат Bot API (Message, True или None)."""
+
+    def __init__(self, chat_id, method, kwargs, coalesce=False, target=None):
+        self.chat_id = chat_id
+        self.method = method
+        self.kwargs = kwargs
+        self.coalesce = coalesce
+        # Для edit/delete: сообщение, над которым операция
+        self.target = target
+        self.state = "queued"  # queued -> sending -> done
+        # Контекст хендлера: спаны Bot API должны попасть в трейс его апдейта
+        self.context = contextvars.copy_context()
+        self.future = asyncio.get_running_loop().create_future()
+        # Ошибку уже залогировал воркер; не ругаемся на «never retrieved»
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def __await__(self):
+        return asyncio.shield(self.future).__await__()
+
+    def can_join(self, other):
+        """Можно ли приклеить other к этому сообщению"""
+        return (
+            self.coalesce and other.coalesce and self.method == other.method == "send_message"
+            and self.kwargs.keys() == other.kwargs.keys()
+            and all(self.kwargs[k] == other.kwargs[k] for k in self.kwargs if k != "text")
+        )
+
+
+class _Chat:
+    __slots__ = ("queue", "limiter", "wakeup", "task")
+
+    def __init__(self, rate, burst):
+        self.queue = deque()
+        self.limiter = RateLimiter(rate, burst)
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+
+class Outbox:
+    def __init__(self, bot, global_rate=None, chat_rate=None, chat_burst=None, max_in_flight=None):
+        self.bot = bot
+        self.in_flight = asyncio.Semaphore(max_in_flight or OUTBOX_MAX_IN_FLIGHT)
+        self.global_limiter = RateLimiter(global_rate or OUTBOX_GLOBAL_RATE, 1)
+        self.chat_rate = chat_rate or OUTBOX_CHAT_RATE
+        self.chat_burst = chat_burst or OUTBOX_CHAT_BURST
+        self.chats = {}
+        self.pending = set()
+        self.api_calls = 0
+
+    # --- Что зовут хендлеры ---
+
+    def send_message(self, chat_id, text, coalesce=True, **kwargs):
+        """Текст без клавиатуры может склеиться с соседними (coalesce=False запрещает)"""
+        coalesce = coalesce and "reply_markup" not in kwargs
+        return self._push(Outgoing(chat_id, "send_message", dict(text=text, **kwargs), coalesce))
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        return self._push(Outgoing(chat_id, "send_photo", dict(photo=photo, **kwargs)))
+
+    def send_video(self, chat_id, video, **kwargs):
+        return self._push(Outgoing(chat_id, "send_video", dict(video=video, **kwargs)))
+
+    def status(self, chat_id, text, **kwargs):
+        """Временное сообщение: потом его delete() или replace()"""
+        return self.send_message(chat_id, text, coalesce=False, **kwargs)
+
+    def delete(self, out):
+        """Удалить сообщение. Если оно ещё не ушло — просто не отправлять."""
+        if out.state == "queued" and self._unqueue(out):
+            return out
+        return self._push(Outgoing(out.chat_id, "delete_message", {}, target=out))
+
+    def replace(self, out, text, **kwargs):
+        """Заменить текст. Неотправленное уйдёт сразу с новым текстом, отправленное — одним edit."""
+        if out.state == "queued":
+            out.kwargs.update(text=text, **kwargs)
+            return out
+        return self._push(Outgoing(out.chat_id, "edit_message_text", dict(text=text, **kwargs), target=out))
+
+    async def drain(self):
+        """Дождаться, пока всё, что уже в очереди, уйдёт"""
+        while self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+
+    async def close(self):
+        for chat in list(self.chats.values()):
+            chat.task.cancel()
+        await asyncio.gather(*(c.task for c in list(self.chats.values())), return_exceptions=True)
+        self.chats.clear()
+
+    # --- Внутреннее ---
+
+    def _push(self, out):
+        chat = self.chats.get(out.chat_id)
+        if chat is None:
+            chat = self.chats[out.chat_id] = _Chat(self.chat_rate, self.chat_burst)
+            # Воркер чата переживает апдейт, который его создал: не наследуем его контекст.
+            # create_task(context=...) есть только с 3.11, поэтому создаём задачу внутри контекста
+            chat.task = contextvars.Context().run(asyncio.create_task, self._run(out.chat_id, chat))
+        chat.queue.append(out)
+        chat.wakeup.set()
+        self.pending.add(out.future)
+        out.future.add_done_callback(self.pending.discard)
+        return out
+
+    def _unqueue(self, out):
+        chat = self.chats.get(out.chat_id)
+        if chat is None or out not in chat.queue:
+            return False
+        chat.queue.remove(out)
+        out.state = "done"
+        out.future.set_result(None)
+        return True
+
+    def _take(self, chat):
+        """Следующий запрос из очереди вместе со всем, что к нему приклеилось"""
+        head = chat.queue.popleft()
+        group = [head]
+        size = len(head.kwargs.get("text", ""))
+        while chat.queue and head.can_join(chat.queue[0]):
+            size += len(COALESCE_SEPARATOR) + len(chat.queue[0].kwargs["text"])
+            if size > MESSAGE_LIMIT:
+                break
+            group.append(chat.queue.popleft())
+        for out in group:
+            out.state = "sending"
+        return group
+
+    def _request(self, group):
+        head = group[0]
+        kwargs = dict(head.kwargs, chat_id=head.chat_id)
+        if len(group) > 1:
+            kwargs["text"] = COALESCE_SEPARATOR.join(out.kwargs["text"] for out in group)
+        if head.target is not None:
+            message = head.target.future.result() if not head.target.future.exception() else None
+            if message is None:
+                # Исходное не ушло: удалять нечего, а замена становится обычной отправкой
+                return None if head.method == "delete_message" else ("send_message", kwargs)
+            kwargs["message_id"] = message.message_id
+        return head.method, kwargs
+
+    async def _call(self, chat, context, method, kwargs):
+        for attempt in range(OUTBOX_MAX_RETRIES + 1):
+            await chat.limiter.acquire()
+            await self.global_limiter.acquire()
+            self.api_calls += 1
+            try:
+                async with self.in_flight:
+                    request = getattr(self.bot, method)(**kwargs)
+                    return await context.run(asyncio.create_task, request)
+            except TelegramRetryAfter as e:
+                # Пауза нужна и при отказе: следующее сообщение чата упёрлось бы в тот же лимит
+                chat.limiter.pause(e.retry_after)
+                if attempt == OUTBOX_MAX_RETRIES:
+                    raise
+                print(f"⏳ Outbox: флуд-контроль в чате {kwargs['chat_id']}, ждём {e.retry_after} с")
+
+    async def _run(self, chat_id, chat):
+        while True:
+            if not chat.queue:
+                # Держим чат, пока бакет не наполнится: иначе новая пачка обошла бы лимит
+                chat.wakeup.clear()
+                try:
+                    await asyncio.wait_for(chat.wakeup.wait(), chat.limiter.time_to_full())
+                except asyncio.TimeoutError:
+                    # wait_for отменяет ожидание с await внутри: за это время могли что-то положить
+                    if not chat.queue:
+                        break
+                continue
+            group = self._take(chat)
+            try:
+                request = self._request(group)
+                result = await self._call(chat, group[0].context, *request) if request else None
+            except Exception as e:
+                print(f"❌ Outbox: ошибка {group[0].method} в чат {chat_id}: {e}")
+                for out in group:
+                    out.state = "done"
+                    out.future.set_exception(e)
+                continue
+            for out in group:
+                out.state = "done"
+                out.future.set_result(result)
+        del self.chats[chat_id]
@@ -6,6 +6,13 @@ import asyncio
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Клиенты создаются при импорте модулей; настоящие ключи тестам не нужны
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-token")
+# Тесты работают только со своими временными SQLite-файлами. Пустая строка, а не
+# удаление: иначе load_dotenv в tracing.py подтянул бы DATABASE_URL из .env
+os.environ["DATABASE_URL"] = ""
+
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -0,0 +1,100 @@
+import pytest
+from datetime import datetime, timedelta
+from llm_router import LLMRouter
+
+import autopilot
+import database
+import gpt_core
+from benchmarks.fakes import FakeLLM
+
+
+@pytest.fixture
+def test_db(tmp_path):
+    database.set_storage(database.SQLiteStorage(str(tmp_path / "test_bot_data.db")))
+    yield
+    database.set_storage(None)
+
+
+class FakeSearch:
+    """По 3 статьи на тему; ссылки пересекаются между темами"""
+
+    def __init__(self):
+        self.queries = []
+
+    async def __call__(self, query, region):
+        self.queries.append(query)
+        return [
+            {"title": f"Новость {i}", "summary": f"Подробности новости {i} " * 10, "link": f"https://news.example/{i}"}
+            for i in range(len(self.queries), len(self.queries) + 3)
+        ]
+
+
+async def setup_channel():
+    await database.init_db()
+    await database.add_channel(42, "@chan", "Канал")
+    channel_id = (await database.get_user_channels(42))[0]['id']
+    await database.set_news_topics(channel_id, ["AI", "стартапы"])
+    return channel_id
+
+
+def test_next_publish_date():
+    now = datetime(2030, 1, 1, 9, 30)
+    assert autopilot.next_publish_date(None, now) == datetime(2030, 1, 2, 12, 0)
+    assert autopilot.next_publish_date(datetime(2030, 1, 5, 12, 0), now) == datetime(2030, 1, 6, 12, 0)
+
+
+@pytest.mark.asyncio
+async def test_autopilot_fills_free_slots_and_dedupes(test_db, monkeypatch):
+    """Посты встают в очередь через день, повторный прогон не берёт старые ссылки"""
+    llm = await FakeLLM(posts_per_request=2).start()
+    monkeypatch.setattr(gpt_core, "router", LLMRouter([llm.provider()]))
+    try:
+        channel_id = await setup_channel()
+        search = FakeSearch()
+
+        stats = await autopilot.run_channel(channel_id, search_fn=search, max_posts=10, max_calls=10, batch_chars=400)
+        assert sorted(search.queries) == ["AI", "стартапы"]
+        assert stats["found"] == 6 and stats["fresh"] == 4
+        assert stats["llm_calls"] == 4 and stats["enqueued"] == 8
+        assert set(stats["stage_seconds"]) == {"search", "dedupe", "generate", "enqueue"}
+
+        pending = await database.get_all_pending_posts(channel_id)
+        dates = [datetime.fromisoformat(str(p['publish_date'])) for p in pending]
+        assert len(dates) == 8
+        assert all(b - a == timedelta(days=1) for a, b in zip(dates, dates[1:]))
+
+        repeat = await autopilot.run_channel(channel_id, search_fn=FakeSearch(), max_posts=10, max_calls=10, batch_chars=400)
+        assert repeat["found"] == 6 and repeat["fresh"] == 0
+    finally:
+        await llm.stop()
+
+
+@pytest.mark.asyncio
+async def test_autopilot_respects_llm_budget(test_db):
+    channel_id = await setup_channel()
+    calls = []
+
+    async def fake_generate(user_text, channel_id):
+        calls.append(user_text)
+        return []
+
+    stats = await autopilot.run_channel(channel_id, search_fn=FakeSearch(), generate_fn=fake_generate,
+                                        max_posts=10, max_calls=1, batch_chars=100)
+    assert len(calls) == 1
+    assert stats["enqueued"] == 0
+    assert await database.get_all_pending_posts(channel_id) == []
+
+
+@pytest.mark.asyncio
+async def test_autopilot_stops_pulling_news_once_budget_is_spent(test_db):
+    """Конвейер ленивый: после последнего поста новые статьи не читаются"""
+    channel_id = await setup_channel()
+
+    async def fake_generate(user_text, channel_id):
+        return ["Пост по новости"]
+
+    stats = await autopilot.run_channel(channel_id, search_fn=FakeSearch(), generate_fn=fake_generate,
+                                        max_posts=1, max_calls=5, batch_chars=100)
+    assert stats["enqueued"] == 1 and stats["llm_calls"] == 1
+    # batch заглядывает на одну статью вперёд, дальше чтение останавливается
+    assert stats["fresh"] == 2
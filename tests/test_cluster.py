@@ -0,0 +1,26 @@
+import json
+import pytest
+from aiogram.types import Update
+
+import cluster
+from benchmarks.load_test import make_message_update, make_callback_update
+
+
+def test_shard_is_stable_per_user():
+    """Сообщения и колбэки одного пользователя идут в один воркер"""
+    message = make_message_update(1, 1005, "/start")
+    callback = make_callback_update(2, 1005, "queue_1")
+
+    assert cluster.shard_for(message, 4) == 1005 % 4
+    assert cluster.shard_for(callback, 4) == 1005 % 4
+
+
+def test_update_survives_process_boundary():
+    update = Update.model_validate(make_callback_update(7, 42, "act_del"))
+    data = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+    restored = Update.model_validate_json(json.dumps(data))
+
+    assert cluster.shard_for(data, 3) == 42 % 3
+    assert restored.callback_query.from_user.id == 42
+    assert restored.callback_query.data == "act_del"
+
@@ -1,6 +1,9 @@
 import pytest
 from unittest.mock import AsyncMock, patch
+from llm_router import LLMRouter
+import database
 import gpt_core
+from benchmarks.fakes import FakeLLM
 
 @pytest.mark.asyncio
 async def test_split_content_empty_response():
@@ -27,4 +30,32 @@ async def test_rewrite_post_fallback():
         mock_instance.generate_content_async = AsyncMock(side_effect=Exception("Fail"))
         
         result = await gpt_core.rewrite_post_gpt(original_text)
-        assert result == original_text
\ No newline at end of file
+        assert result == original_text
+
+class TruncatingLLM(FakeLLM):
+    """Первый ответ обрывается посреди первого поста, продолжение дописывает JSON"""
+
+    def completion_text(self, body):
+        if body.get("response_format"):
+            return '{"posts": ["Я заметила, что лучшие идеи приходят'
+        return ' на прогулке.", "Второй пост тоже достаточно длинный."]}'
+
+
+@pytest.mark.asyncio
+async def test_split_content_continues_truncated_response(tmp_path, monkeypatch):
+    """Обрыв до первого поста: один короткий дозапрос вместо повтора генерации"""
+    database.set_storage(database.SQLiteStorage(str(tmp_path / "test_bot_data.db")))
+    llm = await TruncatingLLM().start()
+    monkeypatch.setattr(gpt_core, "router", LLMRouter([llm.provider()]))
+    try:
+        await database.init_db()
+        posts = await gpt_core.split_content_to_posts("Тема поста", 1)
+
+        assert posts == [
+            "Я заметила, что лучшие идеи приходят на прогулке.",
+            "Второй пост тоже достаточно длинный.",
+        ]
+        assert sum(llm.calls.values()) == 2
+    finally:
+        await llm.stop()
+        database.set_storage(None)
@@ -0,0 +1,71 @@
+import json
+import random
+import pytest
+from llm_json import parse_posts
+
+POSTS = [
+    "Я заметила, что лучшие идеи приходят на прогулке, а не за столом.",
+    "Три года назад я ушла из найма. Вот что я поняла за это время:\n— свобода требует дисциплины.",
+    "Почему \"продуктивность\" — не про количество задач, а про фокус.",
+]
+VALID = json.dumps({"posts": POSTS}, ensure_ascii=False)
+
+# Дефекты, которые реально встречаются в ответах моделей
+CORPUS = [
+    (VALID, POSTS, True),
+    ("```json\n" + VALID + "\n```", POSTS, True),
+    ("```\n" + VALID, POSTS, True),
+    ("Конечно! Вот посты:\n" + VALID + "\nНадеюсь, понравится.", POSTS, True),
+    (VALID.replace('"]}', '",]}'), POSTS, True),
+    (VALID.replace("\\n", "\n"), POSTS, True),
+    (json.dumps({"result": POSTS}, ensure_ascii=False), POSTS, True),
+    (json.dumps(POSTS, ensure_ascii=False), POSTS, True),
+    (json.dumps({"posts": [{"text": p} for p in POSTS]}, ensure_ascii=False), POSTS, True),
+    (json.dumps({"posts": POSTS + ["ок", 42, None]}, ensure_ascii=False), POSTS, True),
+    (VALID[:VALID.index(POSTS[2][:6]) + 6], POSTS[:2], False),
+    (VALID[:-3] + "]}", POSTS, True),
+    (VALID[:-3], POSTS[:2], False),
+    ('{"posts": ', [], False),
+    ("", [], False),
+    # Законченные ответы без постов: дозапрос продолжения тут не поможет
+    ("Извините, не могу помочь.", [], True),
+    ("Извините, не могу.", [], True),
+    ('{"error": "content policy"}', [], True),
+    ('"Извините, не могу."', [], True),
+]
+
+
+@pytest.mark.parametrize("text, expected, complete", CORPUS)
+def test_corpus(text, expected, complete):
+    assert parse_posts(text) == (expected, complete)
+
+
+def test_truncated_at_every_position_never_loses_finished_posts():
+    """Обрыв в любом месте: все посты, закрытые до обрыва, на месте"""
+    for cut in range(len(VALID) + 1):
+        text = VALID[:cut]
+        posts, complete = parse_posts(text)
+        finished = [p for p in POSTS if json.dumps(p, ensure_ascii=False) in text]
+        assert posts[:len(finished)] == finished
+        assert set(posts) <= set(POSTS)
+        assert complete == (cut >= len(VALID) - 1)
+
+
+def test_fuzz_random_mutations_do_not_crash():
+    """Случайные вставки, удаления и замены: разбор не падает и не выдумывает посты"""
+    rng = random.Random(1337)
+    noise = list(',[]{}":\\ \n`') + ["```", "null", ",,", '\\"']
+    for _ in range(3000):
+        chars = list(VALID)
+        for _ in range(rng.randint(1, 4)):
+            pos = rng.randrange(len(chars) + 1)
+            op = rng.random()
+            if op < 0.4:
+                chars.insert(pos, rng.choice(noise))
+            elif op < 0.8 and chars:
+                del chars[min(pos, len(chars) - 1)]
+            else:
+                chars = chars[:pos]
+        posts, complete = parse_posts("".join(chars))
+        assert isinstance(posts, list) and isinstance(complete, bool)
+        assert all(isinstance(p, str) and len(p) >= 20 for p in posts)
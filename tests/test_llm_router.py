@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+import llm_router
+from llm_router import LLMRouter
+from benchmarks.fakes import FakeLLM
+
+MESSAGES = [{"role": "user", "content": "Перепиши этот пост, пожалуйста"}]
+
+
+@asynccontextmanager
+async def endpoints():
+    """Два локальных OpenAI-совместимых сервера с разной задержкой"""
+    slow = await FakeLLM(latency=0.15).start()
+    fast = await FakeLLM(latency=0.01).start()
+    try:
+        yield slow, fast
+    finally:
+        await slow.stop()
+        await fast.stop()
+
+
+@pytest.mark.asyncio
+async def test_routes_to_fastest_provider():
+    """После первых замеров трафик уходит к быстрому провайдеру"""
+    async with endpoints() as (slow, fast):
+        router = LLMRouter([slow.provider("slow"), fast.provider("fast")])
+
+        for _ in range(10):
+            await router.chat("fast", MESSAGES)
+
+        assert slow.calls == {"slow-fast": 1}
+        assert fast.calls == {"fast-fast": 9}
+        assert router.snapshot()["fast/fast-fast"]["latency"] < router.snapshot()["slow/slow-fast"]["latency"]
+
+
+@pytest.mark.asyncio
+async def test_tiers_pick_their_models():
+    async with endpoints() as (slow, fast):
+        router = LLMRouter([fast.provider("groq", {"fast": "llama-8b", "large": "llama-70b"})])
+
+        await router.chat("fast", MESSAGES)
+        _, (provider, model) = await router.chat("large", MESSAGES)
+
+        assert fast.calls == {"llama-8b": 1, "llama-70b": 1}
+        assert (provider.name, model) == ("groq", "llama-70b")
+
+
+@pytest.mark.asyncio
+async def test_failover_and_cooldown():
+    """Провайдер с ошибками уходит на остывание, запросы идут в запасной"""
+    async with endpoints() as (slow, fast):
+        fast.fail_rate = 1.0
+        router = LLMRouter([fast.provider("fast"), slow.provider("slow")])
+
+        response, (provider, _) = await router.chat("large", MESSAGES)
+        assert provider.name == "slow"
+        assert response.choices[0].message.content
+
+        await router.chat("large", MESSAGES)
+        assert fast.calls == {"fast-large": 1}
+        assert slow.calls == {"slow-large": 2}
+
+
+@pytest.mark.asyncio
+async def test_failed_fast_route_gets_traffic_back(monkeypatch):
+    """Один сбой не отдаёт трафик медленному запасному навсегда"""
+    monkeypatch.setattr(llm_router, "COOLDOWN_BASE", 0.05)
+    monkeypatch.setattr(llm_router, "ERROR_HALF_LIFE", 0.05)
+    primary = await FakeLLM(latency=0.05).start()
+    backup = await FakeLLM(latency=0.08).start()
+    try:
+        router = LLMRouter([primary.provider("primary"), backup.provider("backup")])
+        # Замеряем оба маршрута
+        await router.chat("fast", MESSAGES)
+        await router.chat("fast", MESSAGES)
+
+        primary.fail_rate = 1.0
+        _, (provider, _) = await router.chat("fast", MESSAGES)
+        assert provider.name == "backup"
+        primary.fail_rate = 0.0
+
+        # С незатухающим штрафом 0.05 * 2.2 > 0.08 и основной маршрут не вернулся бы
+        await asyncio.sleep(0.5)
+        _, (provider, _) = await router.chat("fast", MESSAGES)
+        assert provider.name == "primary"
+    finally:
+        await primary.stop()
+        await backup.stop()
+
+
+@pytest.mark.asyncio
+async def test_all_providers_down_raises(monkeypatch):
+    async with endpoints() as (slow, fast):
+        slow.fail_rate = fast.fail_rate = 1.0
+        router = LLMRouter([slow.provider("slow"), fast.provider("fast")])
+
+        with pytest.raises(Exception):
+            await router.chat("fast", MESSAGES)
+        assert router.snapshot()["slow/slow-fast"]["failures"] == 1
+
+
+def test_providers_from_env(monkeypatch):
+    monkeypatch.delenv("LLM_PROVIDERS", raising=False)
+    monkeypatch.setenv("GROQ_API_KEY", "g")
+    monkeypatch.setenv("GEMINI_API_KEY", "m")
+    monkeypatch.setenv("GROQ_MODEL", "big-model")
+
+    providers = llm_router.providers_from_env()
+    assert [p.name for p in providers] == ["groq", "gemini"]
+    assert providers[0].models["large"] == "big-model"
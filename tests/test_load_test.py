@@ -0,0 +1,39 @@
+import pytest
+from benchmarks import load_test
+
+
+@pytest.mark.asyncio
+async def test_load_test_smoke(tmp_path):
+    """Короткий прогон всей смеси сценариев через диспетчер без ошибок"""
+    result = await load_test.run_load(
+        users=20, actions_per_user=2, concurrency=10,
+        bot_latency=0, llm_latency=0, db_path=str(tmp_path / "bench.db"),
+    )
+
+    assert result["updates"] == 40
+    assert result["errors"] == 0
+    assert result["scheduler"]["ticks"] >= 1
+    assert result["scheduler"]["published"] >= 1
+    assert result["bot_api_calls"]["sendMessage"] > 0
+
+
+@pytest.mark.asyncio
+async def test_cluster_load_smoke():
+    """Апдейты расходятся по двум процессам cluster.py и все обрабатываются без ошибок"""
+    result = await load_test.run_cluster_scaling(
+        [1, 2], users=10, actions_per_user=2, bot_latency=0, llm_latency=0,
+    )
+
+    assert [r["updates"] for r in result["runs"].values()] == [20, 20]
+    assert all(r["errors"] == 0 for r in result["runs"].values())
+    assert result["runs"]["1"]["linear_efficiency"] == 1.0
+    assert result["runs"]["2"]["bot_api_calls"] == result["runs"]["1"]["bot_api_calls"]
+
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {"throughput_rps": 100, "p50_ms": 10, "p99_ms": 50, "peak_rss_mb": 200, "errors": 0}
+    ok = dict(baseline, throughput_rps=95, p99_ms=55)
+    slow = dict(baseline, throughput_rps=60, p99_ms=90)
+
+    assert load_test.compare_to_baseline(ok, baseline, 0.25) == []
+    assert len(load_test.compare_to_baseline(slow, baseline, 0.25)) == 2
@@ -0,0 +1,187 @@
+import json
+import time
+import asyncio
+import pytest
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+import tracing
+import outbox as outbox_module
+from outbox import Outbox, MESSAGE_LIMIT
+
+
+class FakeBot:
+    """Записывает вызовы Bot API; первые flood_waits отправок отвечают RetryAfter"""
+
+    def __init__(self, flood_waits=0, latency=0.0):
+        self.calls = []
+        self.flood_waits = flood_waits
+        self.latency = latency
+        self._message_id = 0
+
+    async def _call(self, method, **kwargs):
+        self.calls.append((method, kwargs))
+        await asyncio.sleep(self.latency)
+        if method == "send_message" and self.flood_waits:
+            self.flood_waits -= 1
+            raise TelegramRetryAfter(SendMessage(chat_id=kwargs["chat_id"], text="x"), "Flood control", 1)
+        if method == "delete_message":
+            return True
+        self._message_id += 1
+        return SimpleNamespace(message_id=self._message_id, text=kwargs.get("text"))
+
+    def __getattr__(self, method):
+        return lambda **kwargs: self._call(method, **kwargs)
+
+    def methods(self):
+        return [method for method, _ in self.calls]
+
+
+@pytest.mark.asyncio
+async def test_plain_messages_are_coalesced_in_order():
+    bot = FakeBot(latency=0.01)
+    box = Outbox(bot)
+
+    box.send_message(1, "первый")
+    box.send_message(1, "второй")
+    box.send_message(1, "третий")
+    box.send_message(1, "с кнопками", reply_markup="kb")
+    box.send_message(1, "четвёртый")
+    await box.drain()
+
+    # Клавиатура не клеится и разрывает серию
+    assert [kw["text"] for _, kw in bot.calls] == ["первый\n\nвторой\n\nтретий", "с кнопками", "четвёртый"]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_respects_message_limit():
+    bot = FakeBot(latency=0.01)
+    box = Outbox(bot)
+
+    box.send_message(1, "head")
+    chunks = [box.send_message(1, "x" * 1500) for _ in range(4)]
+    await box.drain()
+
+    assert [len(kw["text"]) for _, kw in bot.calls] == [4 + 2 * (1500 + 2), 1500 * 2 + 2]
+    assert all(len(kw["text"]) <= MESSAGE_LIMIT for _, kw in bot.calls)
+    # Склеенные сообщения получают общий Message
+    assert (await chunks[0]) is (await chunks[1])
+
+
+@pytest.mark.asyncio
+async def test_status_replaced_before_sending_costs_one_call():
+    bot = FakeBot(latency=0.01)
+    box = Outbox(bot)
+
+    box.send_message(1, "занимает чат")
+    status = box.status(1, "⏳ Пишу...")
+    box.replace(status, "✅ Готово:")
+    await box.drain()
+
+    assert bot.methods() == ["send_message", "send_message"]
+    assert bot.calls[1][1]["text"] == "✅ Готово:"
+
+
+@pytest.mark.asyncio
+async def test_status_deleted_before_sending_is_never_sent():
+    bot = FakeBot(latency=0.01)
+    box = Outbox(bot)
+
+    box.send_message(1, "занимает чат")
+    status = box.status(1, "⏳ Пишу...")
+    box.delete(status)
+    await box.drain()
+
+    assert bot.methods() == ["send_message"]
+    assert await status is None
+
+
+@pytest.mark.asyncio
+async def test_sent_status_is_edited_instead_of_delete_and_send():
+    bot = FakeBot()
+    box = Outbox(bot)
+
+    status = box.status(1, "⏳ Пишу...")
+    sent = await status
+    box.replace(status, "✅ Готово:")
+    box.delete(box.status(1, "временный"))
+    await box.drain()
+
+    assert bot.methods() == ["send_message", "edit_message_text"]
+    assert bot.calls[1][1] == {"chat_id": 1, "message_id": sent.message_id, "text": "✅ Готово:"}
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_retries():
+    bot = FakeBot(flood_waits=1)
+    box = Outbox(bot)
+
+    started = time.monotonic()
+    message = await box.send_message(1, "пост", coalesce=False)
+
+    assert message.text == "пост"
+    assert bot.methods() == ["send_message", "send_message"]
+    assert time.monotonic() - started >= 1
+
+
+@pytest.mark.asyncio
+async def test_chat_rate_limit():
+    bot = FakeBot()
+    box = Outbox(bot, chat_rate=50, chat_burst=2)
+
+    started = time.monotonic()
+    for i in range(6):
+        box.send_message(1, f"пост {i}", coalesce=False)
+    box.send_message(2, "другой чат", coalesce=False)
+    await box.drain()
+
+    # 2 сразу, остальные 4 по 1/50 с; другой чат этот лимит не ждёт
+    assert time.monotonic() - started >= 4 / 50
+    assert len(bot.calls) == 7
+    assert [kw["text"] for _, kw in bot.calls if kw["chat_id"] == 1] == [f"пост {i}" for i in range(6)]
+    await box.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_send_does_not_block_chat(monkeypatch):
+    monkeypatch.setattr(outbox_module, "OUTBOX_MAX_RETRIES", 0)
+    bot = FakeBot(flood_waits=1)
+    box = Outbox(bot)
+
+    failed = box.send_message(1, "первый", coalesce=False)
+    box.send_message(1, "второй", coalesce=False)
+    await box.drain()
+
+    with pytest.raises(TelegramRetryAfter):
+        await failed
+    assert [kw["text"] for _, kw in bot.calls] == ["первый", "второй"]
+
+
+@pytest.mark.asyncio
+async def test_sends_are_traced_under_their_own_update(tmp_path, monkeypatch):
+    """Спан отправки — дочерний для апдейта, который её поставил, а не для первого в чате"""
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(tracing, "_file", None)
+
+    class TracedBot(FakeBot):
+        async def _call(self, method, **kwargs):
+            with tracing.span(f"tg.{method}"):
+                return await super()._call(method, **kwargs)
+
+    box = Outbox(TracedBot(latency=0.01))
+    with tracing.span("update", update_id=1):
+        box.send_message(1, "первый", coalesce=False)
+    with tracing.span("update", update_id=2):
+        box.send_message(1, "второй", coalesce=False)
+    await box.drain()
+
+    tracing._file.close()
+    spans = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text(encoding="utf-8").splitlines()]
+    updates = {s["attrs"]["update_id"]: s["span_id"] for s in spans if s["name"] == "update"}
+    sends = [s["parent_id"] for s in spans if s["name"] == "tg.send_message"]
+    assert sends == [updates[1], updates[2]]
+    await box.close()
@@ -0,0 +1,20 @@
+import pytest
+from benchmarks import startup_profile
+from benchmarks.fakes import FakeBotAPI
+
+
+@pytest.mark.asyncio
+async def test_cold_start_does_not_load_heavy_subsystems():
+    """До первого getUpdates не грузятся клиент LLM, поиск, Postgres и OpenTelemetry"""
+    bot_api = await FakeBotAPI().start()
+    try:
+        report = await startup_profile.measure_once(bot_api.url)
+    finally:
+        await bot_api.stop()
+
+    assert report["polling_s"] >= report["import_s"] > 0
+    assert not {"openai", "duckduckgo_search", "asyncpg", "opentelemetry"} & set(report["loaded"])
+    # Планировщик не отложен: start_background поднимает его параллельно с getMe,
+    # то есть ещё до первого getUpdates
+    assert "apscheduler" in report["loaded"]
+    assert bot_api.calls["deleteWebhook"] == 1
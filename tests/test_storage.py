@@ -0,0 +1,262 @@
+"""Один и тот же набор проверок для SQLite и PostgreSQL.
+
+PostgreSQL берётся из TEST_DATABASE_URL (например, локальный контейнер
+`docker run -e POSTGRES_HOST_AUTH_METHOD=trust -p 5432:5432 postgres`),
+иначе из встроенного pgserver, если он установлен. Без них — skip.
+"""
+import os
+import pytest
+from datetime import datetime, timedelta
+import database
+
+
+def postgres_dsn(tmp_path_factory):
+    if os.getenv("TEST_DATABASE_URL"):
+        return os.getenv("TEST_DATABASE_URL")
+    try:
+        import pgserver
+    except ImportError:
+        pytest.skip("нет TEST_DATABASE_URL и pgserver")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")))
+    return server.get_uri()
+
+
+@pytest.fixture(scope="session")
+def pg_dsn(tmp_path_factory):
+    pytest.importorskip("asyncpg")
+    return postgres_dsn(tmp_path_factory)
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def storage(request, tmp_path):
+    if request.param == "sqlite":
+        backend = database.SQLiteStorage(str(tmp_path / "test_bot_data.db"))
+    else:
+        from database_pg import PostgresStorage
+        backend = PostgresStorage(request.getfixturevalue("pg_dsn"))
+    database.set_storage(backend)
+    yield backend
+    database.set_storage(None)
+
+
+async def fresh_db(backend):
+    if not isinstance(backend, database.SQLiteStorage):
+        pool = await backend.pool()
+        await pool.execute("DROP TABLE IF EXISTS channels, style_examples, schedule, schedule_archive, users, promocodes, leases, news_topics, covered_links")
+    await database.init_db()
+
+
+async def close(backend):
+    if hasattr(backend, "close"):
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_promocode_activation(storage):
+    await fresh_db(storage)
+    try:
+        code = await database.create_promocode(1)
+        assert not await database.check_user_access(42)
+
+        ok, _ = await database.activate_user(42, code.lower())
+        assert ok
+        assert await database.check_user_access(42)
+
+        ok, msg = await database.activate_user(43, code)
+        assert not ok and "использован" in msg
+        ok, msg = await database.activate_user(43, "NOPE")
+        assert not ok and "не существует" in msg
+    finally:
+        await close(storage)
+
+
+@pytest.mark.asyncio
+async def test_channels_and_style(storage):
+    await fresh_db(storage)
+    try:
+        await database.add_channel(42, "@chan", "Мой канал")
+        channels = await database.get_user_channels(42)
+        assert len(channels) == 1 and channels[0]['title'] == "Мой канал"
+        channel_id = channels[0]['id']
+        assert (await database.get_channel_by_id(channel_id))['channel_tg_id'] == "@chan"
+
+        await database.add_style_example(channel_id, "Привет, это мой авторский стиль!")
+        assert "авторский стиль" in await database.get_style_prompt(channel_id)
+        await database.clear_style_examples(channel_id)
+        assert await database.get_style_prompt(channel_id) == ""
+    finally:
+        await close(storage)
+
+
+@pytest.mark.asyncio
+async def test_schedule_lifecycle(storage):
+    await fresh_db(storage)
+    try:
+        await database.add_channel(42, "@chan", "Канал")
+        channel_id = (await database.get_user_channels(42))[0]['id']
+        future_date = datetime(2030, 1, 1, 12, 0, 0)
+
+        await database.add_post_to_schedule(channel_id, "Test Post", future_date)
+        pending = await database.get_all_pending_posts(channel_id)
+        assert len(pending) == 1 and pending[0]['post_text'] == "Test Post"
+        assert await database.get_last_scheduled_date(channel_id) == future_date
+        assert "Test Post" in await database.get_recent_generated_posts(channel_id)
+
+        post_id = pending[0]['id']
+        await database.update_scheduled_post_text(post_id, "Edited")
+        await database.update_scheduled_post_media(post_id, "file-1", "photo")
+        post = await database.get_scheduled_post(post_id)
+        assert post['post_text'] == "Edited" and post['media_file_id'] == "file-1"
+
+        assert len(await database.get_due_posts(datetime(2020, 1, 1))) == 0
+        assert len(await database.get_due_posts(datetime(2031, 1, 1))) == 1
+
+        await database.mark_as_published(post_id)
+        assert await database.get_all_pending_posts(channel_id) == []
+        await database.delete_post(post_id)
+        assert await database.get_scheduled_post(post_id) is None
+    finally:
+        await close(storage)
+
+
+@pytest.mark.asyncio
+async def test_claim_due_posts_once(storage):
+    """Забранный пост не выдаётся повторно, пока claim не истёк"""
+    await fresh_db(storage)
+    try:
+        await database.add_channel(42, "@chan", "Канал")
+        channel_id = (await database.get_user_channels(42))[0]['id']
+        now = datetime.now()
+        for i in range(3):
+            await database.add_post_to_schedule(channel_id, f"Пост {i}", now - timedelta(minutes=i + 1))
+        await database.add_post_to_schedule(channel_id, "Будущий", now + timedelta(days=1))
+
+        first = await database.claim_due_posts(now, limit=2)
+        second = await database.claim_due_posts(now)
+        assert len(first) == 2 and len(second) == 1
+        assert first[0]['channel_tg_id'] == "@chan"
+        assert {r['id'] for r in first}.isdisjoint(r['id'] for r in second)
+        assert await database.claim_due_posts(now) == []
+    finally:
+        await close(storage)
+
+
+@pytest.mark.asyncio
+async def test_lease(storage):
+    await fresh_db(storage)
+    try:
+        assert await database.try_acquire_lease("publisher", "a", 60)
+        assert not await database.try_acquire_lease("publisher", "b", 60)
+        assert await database.try_acquire_lease("publisher", "a", -1)
+        assert await database.try_acquire_lease("publisher", "b", 60)
+    finally:
+        await close(storage)
+
+
+@pytest.mark.asyncio
+async def test_archive_keeps_history_and_stats(storage):
+    """Старые опубликованные посты уходят в архив, но видны анти-повторам и статистике"""
+    await fresh_db(storage)
+    try:
+        await database.add_channel(42, "@chan", "Канал")
+        channel_id = (await database.get_user_channels(42))[0]['id']
+        now = datetime.now()
+        for i in range(5):
+            await database.add_post_to_schedule(channel_id, f"Старый пост {i}", now - timedelta(days=400 - i))
+        await database.add_post_to_schedule(channel_id, "Свежий опубликованный", now - timedelta(days=1))
+        await database.add_post_to_schedule(channel_id, "В очереди", now + timedelta(days=1))
+        for post in await database.claim_due_posts(now):
+            await database.mark_as_published(post['id'])
+
+        assert await database.archive_published_posts(days=30) == 5
+        assert await database.archive_published_posts(days=30) == 0
+
+        stats = await database.get_channel_stats(channel_id)
+        assert stats == {"published": 6, "pending": 1, "archived": 5}
+        assert len(await database.get_all_pending_posts(channel_id)) == 1
+
+        history = await database.get_recent_generated_posts(channel_id, limit=10)
+        assert "Старый пост 0" in history and "Свежий опубликованный" in history
+        assert history.index("В очереди") < history.index("Старый пост 4")
+    finally:
+        await close(storage)
+
+
+@pytest.mark.asyncio
+async def test_archive_overwrites_conflicting_archive_rows(storage):
+    """Строка с тем же id в архиве не должна съесть пост: он перезаписывается и считается"""
+    await fresh_db(storage)
+    try:
+        await database.add_channel(42, "@chan", "Канал")
+        channel_id = (await database.get_user_channels(42))[0]['id']
+        now = datetime.now()
+        for i in range(3):
+            await database.add_post_to_schedule(channel_id, f"Старый пост {i}", now - timedelta(days=400 - i))
+        posts = await database.claim_due_posts(now)
+        for post in posts:
+            await database.mark_as_published(post['id'])
+
+        # Остаток прерванного переноса: в архиве уже лежит строка с id первого поста
+        stale = (posts[0]['id'], channel_id, "устаревшая копия", None, None, now - timedelta(days=500), now)
+        if isinstance(storage, database.SQLiteStorage):
+            async with storage.connect() as db:
+                await db.execute("INSERT INTO schedule_archive (id, channel_id, post_text, media_file_id, media_type, publish_date, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?)", stale)
+                await db.commit()
+        else:
+            pool = await storage.pool()
+            await pool.execute("INSERT INTO schedule_archive (id, channel_id, post_text, media_file_id, media_type, publish_date, archived_at) VALUES ($1, $2, $3, $4, $5, $6, $7)", *stale)
+
+        assert await database.archive_published_posts(days=30) == 3
+        stats = await database.get_channel_stats(channel_id)
+        assert stats["archived"] == 3
+        history = await database.get_recent_generated_posts(channel_id, limit=10)
+        assert "Старый пост 0" in history and "устаревшая копия" not in history
+    finally:
+        await close(storage)
+
+
+@pytest.mark.asyncio
+async def test_compact_never_runs_full_vacuum_on_old_file(tmp_path):
+    """Старый файл без auto_vacuum ретеншн не трогает; переводит только разовый vacuum()"""
+    import aiosqlite
+    path = str(tmp_path / "old.db")
+    async with aiosqlite.connect(path) as db:
+        await db.execute("CREATE TABLE t (x)")
+        await db.commit()
+    backend = database.SQLiteStorage(path)
+
+    async def mode():
+        async with aiosqlite.connect(path) as db:
+            async with db.execute("PRAGMA auto_vacuum") as cursor:
+                return (await cursor.fetchone())[0]
+
+    await backend.compact()
+    assert await mode() == 0
+    await backend.vacuum()
+    assert await mode() == 2
+
+
+@pytest.mark.asyncio
+async def test_archive_returns_freed_pages_to_file(tmp_path):
+    """После переноса incremental_vacuum отдаёт файлу все свободные страницы, а не одну"""
+    backend = database.SQLiteStorage(str(tmp_path / "test_bot_data.db"))
+    database.set_storage(backend)
+    try:
+        await database.init_db()
+        await database.add_channel(42, "@chan", "Канал")
+        channel_id = (await database.get_user_channels(42))[0]['id']
+        now = datetime.now()
+        for i in range(100):
+            await database.add_post_to_schedule(channel_id, f"Старый пост {i} " + "x" * 4000, now - timedelta(days=400))
+        for post in await database.claim_due_posts(now):
+            await database.mark_as_published(post['id'])
+
+        async def freelist():
+            async with backend.connect() as db:
+                async with db.execute("PRAGMA freelist_count") as cursor:
+                    return (await cursor.fetchone())[0]
+
+        assert await database.archive_published_posts(days=30) == 100
+        assert await freelist() == 0
+    finally:
+        database.set_storage(None)
@@ -0,0 +1,67 @@
+import json
+import asyncio
+import pytest
+import tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "file")
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+    monkeypatch.setattr(tracing, "_file", None)
+    yield path
+    if tracing._file:
+        tracing._file.close()
+
+
+def read_spans(path):
+    tracing._file.flush()
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_spans_propagate_through_tasks(trace_file, monkeypatch):
+    """Дочерние спаны в asyncio-задачах привязаны к корню"""
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+
+    @tracing.traced("child")
+    async def child():
+        await asyncio.sleep(0)
+
+    with tracing.span("root", user_id=1):
+        await asyncio.gather(asyncio.create_task(child()), child())
+
+    spans = read_spans(trace_file)
+    root = next(s for s in spans if s["name"] == "root")
+    children = [s for s in spans if s["name"] == "child"]
+    assert root["parent_id"] is None
+    assert root["attrs"] == {"user_id": 1}
+    assert len(children) == 2
+    assert all(c["parent_id"] == root["span_id"] for c in children)
+    assert all(c["trace_id"] == root["trace_id"] for c in children)
+
+
+@pytest.mark.asyncio
+async def test_unsampled_trace_writes_nothing(trace_file, monkeypatch):
+    """При sample rate 0 ни корень, ни дети не пишутся"""
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+
+    with tracing.span("root") as root:
+        with tracing.span("child") as child:
+            assert root is None and child is None
+
+    assert tracing._file is None
+    assert not trace_file.exists()
+
+
+def test_span_records_error(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+
+    with pytest.raises(ValueError):
+        with tracing.span("boom"):
+            raise ValueError("bad json")
+
+    spans = read_spans(trace_file)
+    assert spans[0]["error"] == "ValueError: bad json"
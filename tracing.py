@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import random
+import uuid
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")  # file | otel
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+# Выбран ли трейс: решается один раз на корневом спане, дочерние наследуют.
+# contextvars копируются в asyncio-задачи, так что контекст переживает create_task.
+_current_span = contextvars.ContextVar("current_span", default=None)
+_UNSAMPLED = object()
+
+_file = None
+_otel_tracer = None
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "attrs", "error", "_otel")
+
+    def __init__(self, name, trace_id, parent_id, attrs):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.attrs = attrs
+        self.error = None
+        self._otel = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        if self._otel is not None:
+            for key, value in attrs.items():
+                self._otel.set_attribute(key, value)
+
+
+def _write_span(span, duration):
+    global _file
+    if _file is None:
+        _file = open(TRACE_FILE, "a", encoding="utf-8")
+    record = {
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "parent_id": span.parent_id,
+        "name": span.name,
+        "start": span.start,
+        "duration_ms": round(duration * 1000, 3),
+        "attrs": span.attrs,
+    }
+    if span.error:
+        record["error"] = span.error
+    _file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    if span.parent_id is None:
+        _file.flush()
+
+
+def _get_otel_tracer():
+    """OpenTelemetry подключается только если пакеты установлены, иначе пишем в файл"""
+    global _otel_tracer, TRACE_EXPORTER
+    if _otel_tracer is not None:
+        return _otel_tracer
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logging.warning("opentelemetry не установлен, трейсы пишутся в %s", TRACE_FILE)
+        TRACE_EXPORTER = "file"
+        return None
+
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        if not isinstance(trace.get_tracer_provider(), TracerProvider):
+            provider = TracerProvider()
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+    except ImportError:
+        pass
+
+    _otel_tracer = trace.get_tracer("ai-ghostwriter-bot")
+    return _otel_tracer
+
+
+@contextmanager
+def span(name, **attrs):
+    """Спан вокруг участка кода. При выключенном трейсинге почти бесплатен."""
+    if not TRACE_ENABLED:
+        yield None
+        return
+
+    parent = _current_span.get()
+    if parent is _UNSAMPLED:
+        yield None
+        return
+    if parent is None and random.random() >= TRACE_SAMPLE_RATE:
+        token = _current_span.set(_UNSAMPLED)
+        try:
+            yield None
+        finally:
+            _current_span.reset(token)
+        return
+
+    if parent is None:
+        current = Span(name, uuid.uuid4().hex, None, attrs)
+    else:
+        current = Span(name, parent.trace_id, parent.span_id, attrs)
+
+    tracer = _get_otel_tracer() if TRACE_EXPORTER == "otel" else None
+    otel_cm = tracer.start_as_current_span(name, attributes=attrs) if tracer else None
+    if otel_cm is not None:
+        current._otel = otel_cm.__enter__()
+
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        if otel_cm is not None:
+            otel_cm.__exit__(type(e), e, e.__traceback__)
+            otel_cm = None
+        raise
+    finally:
+        _current_span.reset(token)
+        if otel_cm is not None:
+            otel_cm.__exit__(None, None, None)
+        elif tracer is None:
+            _write_span(current, time.perf_counter() - started)
+
+
+def traced(name=None):
+    """Декоратор для async-функций: оборачивает вызов в спан"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not TRACE_ENABLED:
+                return await func(*args, **kwargs)
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def trace_bot_requests(make_request, bot, method):
+    """Request-middleware для aiogram: спан на каждый вызов Bot API"""
+    with span(f"tg.{type(method).__name__}"):
+        return await make_request(bot, method)
+
+
+async def trace_updates(handler, event, data):
+    """Outer-middleware для dp.update: корневой спан на каждый апдейт"""
+    with span("update", update_id=event.update_id, event_type=event.event_type):
+        return await handler(event, data)